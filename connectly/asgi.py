@@ -1,7 +1,6 @@
 import os
 import django
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "connectly.settings")
@@ -11,7 +10,7 @@ import meetings.routing
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
-        URLRouter(meetings.routing.websocket_urlpatterns)
-    ),
+    # meeting sockets authenticate with a signed join token in the query
+    # string, so no session/auth middleware (and no DB work) on connect
+    "websocket": URLRouter(meetings.routing.websocket_urlpatterns),
 })
@@ -32,8 +32,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'meetings.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable so the chain stays async under Daphne
+    'meetings.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,27 +66,290 @@ TEMPLATES = [
 ASGI_APPLICATION = 'connectly.asgi.application'
 
 # channel
+# capacity: messages a channel may hold before further sends to it are
+# dropped (group sends) or refused (direct sends); both are counted in
+# channel_layer_full_total. Chat and hand raises travel on the "chat" layer,
+# a second channel per meeting socket, so they have their own capacity and
+# expiry and a chat flood can't crowd out signaling on "default". (With
+# channels_redis the sockets of one worker share a Redis list per layer, so
+# capacity is per worker.) expiry: seconds an undelivered message lives
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
             "hosts": [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379")],
+            "capacity": int(os.environ.get("CHANNEL_CAPACITY", 500)),
+            "expiry": int(os.environ.get("CHANNEL_EXPIRY", 30)),
+            "group_expiry": 86400,
         },
     },
+    "chat": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379")],
+            "prefix": "asgi-chat",
+            "capacity": int(os.environ.get("CHANNEL_CHAT_CAPACITY", 100)),
+            "expiry": int(os.environ.get("CHANNEL_CHAT_EXPIRY", 10)),
+            "group_expiry": 86400,
+        },
+    },
+}
+
+# who is in which meeting; shared across Daphne workers through Redis.
+# meetings.registry.InMemoryParticipantRegistry works for a single process.
+PARTICIPANT_REGISTRY = {
+    "BACKEND": "meetings.registry.RedisParticipantRegistry",
+    "CONFIG": {
+        "hosts": [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379")],
+        "ttl": 60,
+        # roster changes kept for clients asking for a delta
+        "log_size": 100,
+    },
+}
+
+# recent chat / hand events per meeting, sent to late joiners as one
+# backfill frame. meetings.history.InMemoryChatHistory works for a single
+# process. With ARCHIVE on, the buffer is saved as ChatMessage rows when
+# the meeting ends.
+CHAT_HISTORY = {
+    "BACKEND": "meetings.history.RedisChatHistory",
+    "CONFIG": {
+        "hosts": [os.environ.get("REDIS_URL", "redis://127.0.0.1:6379")],
+        "size": 50,
+        "ttl": 24 * 3600,
+    },
+    "ARCHIVE": False,
+}
+
+# meeting lookups on the join path. SHARED_CACHE names a CACHES alias
+# (e.g. a Redis cache) used as a second tier shared between workers. With
+# REDIS_URL set, invalidations (meeting ended or changed) reach the other
+# workers' local caches at once instead of after TTL.
+MEETING_CACHE = {
+    "TTL": 5,
+    "MAX_ENTRIES": 2048,
+    "SHARED_CACHE": None,
+    "SHARED_TTL": 30,
+    "REDIS_URL": os.environ.get("REDIS_URL"),
+}
+
+# meeting code allocation (meetings/codes.py). Codes are pre-generated in
+# batches; with REDIS_URL set the unused ones are shared between workers.
+MEETING_CODES = {
+    "LENGTH": 8,
+    "BATCH_SIZE": 200,
+    "LOCAL_SIZE": 20,
+    "RETRIES": 5,
+    "REDIS_URL": os.environ.get("REDIS_URL"),
+}
+
+# socket stays (join/leave times) from the consumer, batched into
+# AttendanceSession rows and the per-meeting MeetingRollup figures
+ATTENDANCE_LOG = {
+    "MAX_BATCH": 500,
+    "FLUSH_INTERVAL": 2.0,
+    "MAX_PENDING": 10000,
+}
+
+# lifecycle command (meetings/lifecycle.py): when unstarted, stale and
+# abandoned meetings are ended, in seconds. ARCHIVE_AFTER_DAYS moves the
+# participants of ended meetings started that long ago to ParticipantArchive
+# (None keeps them).
+MEETING_LIFECYCLE = {
+    "INTERVAL": 60,
+    "SCHEDULE_GRACE": 2 * 3600,
+    "MAX_DURATION": 24 * 3600,
+    "ABANDON_AFTER": 600,
+    "ARCHIVE_AFTER_DAYS": None,
+    "BATCH_SIZE": 500,
 }
 
+# join logging. With WRITE_BEHIND on, Participant rows are buffered and
+# written with bulk_create; batches the DB rejects go to SPILL_PATH.
+PARTICIPANT_LOG = {
+    "WRITE_BEHIND": os.environ.get("PARTICIPANT_WRITE_BEHIND", "0") == "1",
+    "MAX_BATCH": 200,
+    "FLUSH_INTERVAL": 1.0,
+    "SPILL_PATH": BASE_DIR / "participant_spill.jsonl",
+}
 
+# show a cached, approximate meeting count on the admin dashboard
+DASHBOARD_APPROX_TOTAL = True
+
+# the join endpoints (verify, join, start, schedule, end) as async views;
+# "0" serves their sync twins in meetings/sync_views.py instead, for
+# comparing the two with bench_join --url
+MEETING_ASYNC_VIEWS = os.environ.get("MEETING_ASYNC_VIEWS", "1") == "1"
+
+# /metrics/ (Prometheus text) and the slow-request profiler. /metrics/ is
+# for staff sessions, or scrapers sending "Authorization: Bearer <TOKEN>".
+# Set PROFILE_SLOW_MS to dump collapsed stacks of slower requests to PROFILE_DIR.
+METRICS = {
+    "TOKEN": os.environ.get("METRICS_TOKEN"),
+    "PROFILE_SLOW_MS": None,
+    "PROFILE_DIR": BASE_DIR / "profiles",
+    "PROFILE_INTERVAL": 0.005,
+}
 
+# Logging: JSON lines written by a background QueueListener, so request
+# threads never block on stdout. Credentials are masked; high-frequency
+# events (the ``event`` extra) can be sampled.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "redact": {"()": "meetings.logs.RedactFilter"},
+        "sample": {
+            "()": "meetings.logs.SampleFilter",
+            "rates": {
+                "verify.request": 0.01,
+                "join.request": 0.01,
+            },
+        },
+    },
+    "handlers": {
+        "queue": {
+            "()": "meetings.logs.QueueListenerHandler",
+            "filename": os.environ.get("LOG_FILE") or None,
+            "filters": ["redact", "sample"],
+        },
+    },
+    "root": {"handlers": ["queue"], "level": "WARNING"},
+    "loggers": {
+        "django": {"handlers": ["queue"], "level": "WARNING", "propagate": False},
+        "meetings": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
 
-# Database
+# seconds a signed join token (issued by the join views and the meeting
+# page) stays valid for opening the meeting socket; the client fetches a
+# fresh one from /meet_code/<code>/token/ before each (re)connect
+MEETING_JOIN_TOKEN_MAX_AGE = int(os.environ.get("MEETING_JOIN_TOKEN_MAX_AGE", 60))
+
+# seconds a dropped socket stays on the roster; a reconnect with the same
+# clientId within it is not announced to the room as leave + join
+MEETING_RECONNECT_GRACE = 5
+
+# websocket flood control. LIMITS: per message type, token bucket per
+# connection (rate/s, burst) and optionally per room (room_rate, room_burst).
+# ICE candidates to the same peer within CANDIDATE_WINDOW seconds go out as
+# one candidate_batch frame; a repeated identical presence within
+# PRESENCE_DEDUP_SECONDS is dropped.
+MEETING_THROTTLE = {
+    "LIMITS": {
+        "chat": {"rate": 2, "burst": 10, "room_rate": 50, "room_burst": 200},
+        "hand": {"rate": 0.2, "burst": 2, "room_rate": 5, "room_burst": 20},
+        "screenshare": {"rate": 1, "burst": 3},
+        "candidate": {"rate": 50, "burst": 200},
+        "presence": {"rate": 1, "burst": 5},
+        "roster": {"rate": 1, "burst": 5},
+        "roster_page": {"rate": 2, "burst": 10},
+    },
+    "CANDIDATE_WINDOW": 0.05,
+    "PRESENCE_DEDUP_SECONDS": 10,
+}
+
+# per-socket outbound queue. Clients ack the number of frames they have
+# handled ({"type": "ack", "received": n}, the browser does every 16);
+# with WINDOW frames unacked, further frames wait here, signaling and
+# roster first. At MAX_FRAMES hand raises, candidates older than
+# CANDIDATE_STALE_SECONDS and then chat are dropped, and a client still
+# behind EVICT_AFTER seconds later is disconnected (close code 4008).
+# Daphne has no transport backpressure, so clients that never ack are not
+# held back.
+MEETING_OUTBOX = {
+    "WINDOW": 64,
+    "MAX_FRAMES": 256,
+    "CANDIDATE_STALE_SECONDS": 10,
+    "EVICT_AFTER": 15,
+}
+
+# meetings created with large_room: attendees get a speaker/attendee head
+# count every COUNT_INTERVAL seconds (when it changed) instead of presence
+# events, and page through the roster PAGE_SIZE entries at a time
+MEETING_LARGE_ROOM = {
+    "COUNT_INTERVAL": 2,
+    "PAGE_SIZE": 100,
+}
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Set DATABASE_URL (mysql://... or postgres://...) for production. Connections
+# are kept for DB_CONN_MAX_AGE seconds; on Postgres DB_POOL_MAX_SIZE > 0 turns
+# on psycopg's connection pool instead (the two are mutually exclusive).
+# MySQL has no pool in Django, so persistent connections per worker thread
+# are the pool there, bounded by ASGI_THREADS.
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+if DATABASE_URL:
+    DATABASES = {
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+            conn_health_checks=True,
+        )
+    }
+    _db = DATABASES['default']
+    _pool_size = int(os.environ.get("DB_POOL_MAX_SIZE", 0))
+    if 'postgresql' in _db['ENGINE'] and _pool_size:
+        _db['CONN_MAX_AGE'] = 0
+        _db.setdefault('OPTIONS', {})['pool'] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": _pool_size,
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+    elif 'mysql' in _db['ENGINE']:
+        _db.setdefault('OPTIONS', {}).update({
+            "charset": "utf8mb4",
+            "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
+        })
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # seconds to wait on a locked database before "database is locked"
+                "timeout": 20,
+            },
+        }
     }
+
+# applied to every new SQLite connection (see meetings/signals.py)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "temp_store": "MEMORY",
+    "cache_size": -20000,
+}
+
+# Sessions. SESSION_PROFILE picks the backend:
+#   db             - django_session table (Django's default)
+#   cached_db      - Redis cache in front of the table; reads hit Redis and
+#                    fall back to the DB, writes go to both
+#   cache          - Redis only; sessions are lost if Redis is flushed
+#   signed_cookies - no server-side storage at all
+# Expired rows are removed by the prune_sessions command.
+SESSION_PROFILE = os.environ.get("SESSION_PROFILE", "db")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_PROFILE]
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
 }
+if SESSION_PROFILE in ("cached_db", "cache"):
+    CACHES["sessions"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379"),
+        "KEY_PREFIX": "connectly:session",
+    }
+    SESSION_CACHE_ALIAS = "sessions"
 
 
 # Password validation
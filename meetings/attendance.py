@@ -0,0 +1,171 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .metrics import REGISTRY
+from .models import AttendanceSession, MeetingRollup
+
+logger = logging.getLogger(__name__)
+
+
+class AttendanceLog:
+    """
+    Collects socket stays from the consumer and writes them in batches.
+
+    joined() records the room size seen at a join (for peak concurrency),
+    left() a finished stay. Both only touch an in-memory buffer; a
+    background thread bulk-inserts the stays every flush_interval seconds
+    and folds them into MeetingRollup with one UPDATE per meeting, so the
+    admin pages never aggregate AttendanceSession rows. If the DB refuses a
+    batch it is retried one stay at a time: stays it rejects (IntegrityError,
+    DataError) are logged and dropped, and if the DB is unavailable the rest
+    are kept for the next flush, up to max_pending stays.
+    """
+
+    def __init__(self, max_batch=500, flush_interval=2.0, max_pending=10000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.stays = []
+        self.peaks = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.dropped = 0
+        self.rejected = 0
+
+    def joined(self, meeting_id, concurrent):
+        with self.lock:
+            self.peaks[meeting_id] = max(self.peaks.get(meeting_id, 0), concurrent)
+        self.start()
+
+    def left(self, meeting_id, client_id, name, joined_at, left_at):
+        with self.lock:
+            if len(self.stays) >= self.max_pending:
+                self.dropped += 1
+                return
+            self.stays.append((meeting_id, client_id or "", name, joined_at, left_at))
+            full = len(self.stays) >= self.max_batch
+        self.start()
+        if full:
+            self.wakeup.set()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="attendance-log", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            stays, self.stays = self.stays, []
+            peaks, self.peaks = self.peaks, {}
+        if not stays and not peaks:
+            return
+        try:
+            self.write(stays, peaks)
+        except DatabaseError:
+            logger.exception("attendance flush failed", extra={"event": "attendance.flush_failed"})
+            self.write_each(stays, peaks)
+
+    def write_each(self, stays, peaks):
+        """Retry a refused batch one stay (or peak) at a time, so a bad row can't hold back the rest."""
+        pending = [([stay], {}) for stay in stays] + [([], {m: p}) for m, p in peaks.items()]
+        for i, (batch, peak) in enumerate(pending):
+            try:
+                self.write(batch, peak)
+            except (IntegrityError, DataError):
+                logger.exception("attendance row rejected", extra={"event": "attendance.rejected"})
+                with self.lock:
+                    self.rejected += 1
+            except DatabaseError:
+                # the DB itself is failing; keep the rest for the next flush
+                self.requeue(pending[i:])
+                return
+
+    def requeue(self, pending):
+        with self.lock:
+            self.stays = ([s for batch, _ in pending for s in batch] + self.stays)[:self.max_pending]
+            for _, peak in pending:
+                for meeting_id, value in peak.items():
+                    self.peaks[meeting_id] = max(self.peaks.get(meeting_id, 0), value)
+
+    def write(self, stays, peaks):
+        seconds, names = {}, {}
+        for meeting_id, _, name, joined_at, left_at in stays:
+            seconds[meeting_id] = seconds.get(meeting_id, 0) + int((left_at - joined_at).total_seconds())
+            names.setdefault(meeting_id, set()).add(name)
+        meeting_ids = set(seconds) | set(peaks)
+
+        with transaction.atomic():
+            MeetingRollup.objects.bulk_create(
+                [MeetingRollup(meeting_id=m) for m in meeting_ids], ignore_conflicts=True
+            )
+            # lock the rollups so that flushes from other processes counting
+            # the same meetings wait here; otherwise both would see a name as
+            # new and count it twice
+            list(
+                MeetingRollup.objects.select_for_update()
+                .filter(meeting_id__in=meeting_ids).order_by("meeting_id").values_list("meeting_id")
+            )
+            # names already counted for these meetings, before this batch lands
+            known = set(
+                AttendanceSession.objects.filter(
+                    meeting_id__in=list(names), name__in={n for batch in names.values() for n in batch}
+                ).values_list("meeting_id", "name").distinct()
+            )
+            AttendanceSession.objects.bulk_create(
+                [
+                    AttendanceSession(meeting_id=m, client_id=c, name=n, joined_at=j, left_at=l)
+                    for m, c, n, j, l in stays
+                ],
+                batch_size=self.max_batch,
+            )
+            now = timezone.now()
+            for meeting_id in meeting_ids:
+                new_names = len({n for n in names.get(meeting_id, ()) if (meeting_id, n) not in known})
+                MeetingRollup.objects.filter(meeting_id=meeting_id).update(
+                    peak_concurrency=Greatest(F("peak_concurrency"), peaks.get(meeting_id, 0)),
+                    attendee_seconds=F("attendee_seconds") + seconds.get(meeting_id, 0),
+                    unique_attendees=F("unique_attendees") + new_names,
+                    updated_at=now,
+                )
+
+    def stats(self):
+        with self.lock:
+            return {"depth": len(self.stays), "dropped": self.dropped, "rejected": self.rejected}
+
+
+_conf = getattr(settings, "ATTENDANCE_LOG", {})
+attendance_log = AttendanceLog(
+    max_batch=_conf.get("MAX_BATCH", 500),
+    flush_interval=_conf.get("FLUSH_INTERVAL", 2.0),
+    max_pending=_conf.get("MAX_PENDING", 10000),
+)
+
+def _collect():
+    stats = attendance_log.stats()
+    return {
+        "attendance_log_depth": ("gauge", "Finished stays waiting to be written", stats["depth"]),
+        "attendance_log_dropped_total": ("counter", "Stays dropped with the buffer full", stats["dropped"]),
+        "attendance_log_rejected_total": ("counter", "Stays the database rejected", stats["rejected"]),
+    }
+
+
+REGISTRY.add_collector(_collect)
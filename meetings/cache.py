@@ -0,0 +1,192 @@
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+
+from .models import Meeting
+
+logger = logging.getLogger(__name__)
+
+# pwd_hash, not the password: the tuple is stored in the shared tier
+MeetingInfo = namedtuple("MeetingInfo", "id meeting_code pwd_hash host_status large_room")
+
+_MISSING = object()
+
+
+class MeetingCache:
+    """
+    Read-through cache of the few Meeting columns the join path needs.
+
+    A small per-process LRU with a short TTL sits in front of an optional
+    shared tier (any Django cache alias, normally Redis). Concurrent misses
+    for the same code wait on a per-code lock, so only one of them queries
+    the database. Unknown codes are cached too, as None.
+
+    With ``redis_url`` set, invalidations are also published on a Redis
+    channel, and a listener thread drops the code from every worker's LRU,
+    so a meeting ended on one worker is not still joinable on another until
+    its entry expires.
+    """
+
+    def __init__(self, ttl=5, max_entries=2048, shared_cache=None, shared_ttl=30,
+                 redis_url=None, channel="connectly:meeting_cache"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_cache = shared_cache
+        self.shared_ttl = shared_ttl
+        self.redis_url = redis_url
+        self.channel = channel
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self._redis = None
+        self.listener = None
+
+    @property
+    def shared(self):
+        return caches[self.shared_cache] if self.shared_cache else None
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def key(self, code):
+        # versioned with the MeetingInfo fields, so old tuples are never read back
+        return f"meeting:v3:{code}"
+
+    def _local_get(self, code):
+        with self.lock:
+            entry = self.entries.get(code)
+            if entry is None:
+                return _MISSING
+            info, expires = entry
+            if expires < time.monotonic():
+                del self.entries[code]
+                return _MISSING
+            self.entries.move_to_end(code)
+            return info
+
+    def _local_set(self, code, info):
+        with self.lock:
+            if self.redis_url and self.listener is None:
+                self.listener = threading.Thread(target=self._listen, name="meeting-cache", daemon=True)
+                self.listener.start()
+            self.entries[code] = (info, time.monotonic() + self.ttl)
+            self.entries.move_to_end(code)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _load(self, code):
+        if self.shared is not None:
+            cached = self.shared.get(self.key(code), _MISSING)
+            if cached is not _MISSING:
+                return MeetingInfo(*cached) if cached else None
+
+        row = (
+            Meeting.objects.filter(meeting_code=code)
+            .values_list("id", "meeting_code", "meeting_pwd", "host_status", "large_room")
+            .first()
+        )
+        info = MeetingInfo(row[0], row[1], hash_password(row[2]), *row[3:]) if row else None
+        if self.shared is not None:
+            self.shared.set(self.key(code), tuple(info) if info else None, self.shared_ttl)
+        return info
+
+    def get(self, code):
+        info = self._local_get(code)
+        if info is not _MISSING:
+            return info
+
+        with self.lock:
+            flight = self.inflight.setdefault(code, threading.Lock())
+        with flight:
+            info = self._local_get(code)
+            if info is _MISSING:
+                info = self._load(code)
+                self._local_set(code, info)
+        with self.lock:
+            if self.inflight.get(code) is flight:
+                del self.inflight[code]
+        return info
+
+    async def aget(self, code):
+        info = self._local_get(code)
+        if info is not _MISSING:
+            return info
+        return await sync_to_async(self.get)(code)
+
+    def _local_drop(self, code):
+        with self.lock:
+            self.entries.pop(code, None)
+
+    def invalidate(self, code):
+        self._local_drop(code)
+        if self.shared is not None:
+            self.shared.delete(self.key(code))
+        self.publish(code)
+
+    async def ainvalidate(self, code):
+        self._local_drop(code)
+        if self.shared is not None:
+            await self.shared.adelete(self.key(code))
+        if self.redis_url:
+            await sync_to_async(self.publish)(code)
+
+    def publish(self, code):
+        if self.redis is None:
+            return
+        import redis
+
+        try:
+            self.redis.publish(self.channel, code)
+        except redis.RedisError:
+            # the other workers' entries still expire after ttl
+            logger.warning("meeting cache invalidation not published", exc_info=True)
+
+    def _listen(self):
+        import redis
+
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # anything cached while not subscribed may have missed a message
+                self.clear()
+                for message in pubsub.listen():
+                    self._local_drop(message["data"])
+            except redis.RedisError:
+                logger.warning("meeting cache listener disconnected", exc_info=True)
+                time.sleep(1)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def hash_password(password):
+    # keyed with SECRET_KEY; cheap enough to run on every join, unlike make_password()
+    return salted_hmac("meetings.cache.password", str(password), algorithm="sha256").hexdigest()
+
+
+def check_password(info, password):
+    return bool(info and password) and hmac.compare_digest(info.pwd_hash, hash_password(password))
+
+
+_conf = getattr(settings, "MEETING_CACHE", {})
+meeting_cache = MeetingCache(
+    ttl=_conf.get("TTL", 5),
+    max_entries=_conf.get("MAX_ENTRIES", 2048),
+    shared_cache=_conf.get("SHARED_CACHE"),
+    shared_ttl=_conf.get("SHARED_TTL", 30),
+    redis_url=_conf.get("REDIS_URL"),
+)
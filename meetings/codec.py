@@ -0,0 +1,52 @@
+import json
+import math
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used otherwise
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, the binary subprotocol is not offered without it
+    msgpack = None
+
+
+# websocket subprotocol for MessagePack frames (bytes_data) instead of JSON text
+BINARY_SUBPROTOCOL = "connectly.msgpack"
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"))
+
+    def loads(data):
+        return json.loads(data)
+
+
+def packb(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpackb(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def plain(obj):
+    """
+    True if ``obj`` holds only JSON types (str keys, no bytes, ext types or
+    non-finite floats), so it means the same in both encodings.
+    """
+    if isinstance(obj, dict):
+        return all(isinstance(key, str) and plain(value) for key, value in obj.items())
+    if isinstance(obj, list):
+        return all(plain(value) for value in obj)
+    if isinstance(obj, float):
+        return math.isfinite(obj)
+    return obj is None or isinstance(obj, (str, int, bool))
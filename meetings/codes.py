@@ -0,0 +1,136 @@
+import secrets
+import string
+import threading
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .metrics import REGISTRY
+from .models import Meeting
+
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+CODE_COLLISIONS = REGISTRY.counter(
+    "meeting_code_collisions_total", "Pooled codes rejected by the unique constraint on insert"
+)
+CODE_REFILLS = REGISTRY.counter(
+    "meeting_code_refills_total", "Local pool refills, by where the codes came from", ("source",)
+)
+CODE_DISCARDED = REGISTRY.counter(
+    "meeting_code_discarded_total", "Generated codes dropped because they were already in use"
+)
+
+
+class CodePool:
+    """
+    Hands out unused meeting codes.
+
+    Codes are generated with ``secrets`` in batches of ``batch_size``, and
+    the ones already present in the table are dropped with one query, so
+    each batch is verified before it is used, and kept in a deque. With
+    ``redis_url`` set, batches are parked in a Redis set shared by all
+    workers instead and each worker claims ``local_size`` of them at a time
+    with SPOP, so two workers never hold the same code. If Redis is unavailable the pool
+    generates locally. A code can still collide with a meeting created
+    elsewhere after it was pooled; create_meeting() retries with another
+    code, and only then: any other integrity error is raised.
+    """
+
+    def __init__(self, length=8, batch_size=200, local_size=20, retries=5,
+                 redis_url=None, key="connectly:meeting_codes"):
+        self.length = length
+        self.batch_size = batch_size
+        self.local_size = local_size
+        self.retries = retries
+        self.redis_url = redis_url
+        self.key = key
+        self.codes = deque()
+        self.lock = threading.Lock()
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def generate(self):
+        batch = {
+            "".join(secrets.choice(CODE_ALPHABET) for _ in range(self.length))
+            for _ in range(self.batch_size)
+        }
+        taken = set(Meeting.objects.filter(meeting_code__in=batch).values_list("meeting_code", flat=True))
+        CODE_DISCARDED.inc(len(taken))
+        return list(batch - taken)
+
+    def refill(self):
+        if self.redis is not None:
+            import redis
+
+            try:
+                codes = self.redis.spop(self.key, self.local_size) or []
+                if len(codes) < self.local_size:
+                    batch = self.generate()
+                    need = self.local_size - len(codes)
+                    codes += batch[:need]
+                    if batch[need:]:
+                        self.redis.sadd(self.key, *batch[need:])
+                    CODE_REFILLS.inc(source="generated")
+                else:
+                    CODE_REFILLS.inc(source="redis")
+                self.codes.extend(codes)
+                return
+            except redis.RedisError:
+                CODE_REFILLS.inc(source="redis_error")
+        self.codes.extend(self.generate())
+        CODE_REFILLS.inc(source="generated")
+
+    def take(self):
+        with self.lock:
+            if not self.codes:
+                self.refill()
+            return self.codes.popleft()
+
+    def create_meeting(self, **fields):
+        """Meeting.objects.create() with a pooled code, retried on a collision."""
+        for attempt in range(self.retries):
+            code = self.take()
+            try:
+                with transaction.atomic():
+                    return Meeting.objects.create(meeting_code=code, **fields)
+            except IntegrityError:
+                # a bad field fails the same way with every code
+                if attempt == self.retries - 1 or not Meeting.objects.filter(meeting_code=code).exists():
+                    raise
+                CODE_COLLISIONS.inc()
+
+    async def acreate_meeting(self, **fields):
+        # the pool lock, refills and the atomic block are sync; one hop for all of it
+        return await sync_to_async(self.create_meeting)(**fields)
+
+    def size(self):
+        return len(self.codes)
+
+
+def generate_password(length=6):
+    return "".join(secrets.choice(PASSWORD_ALPHABET) for _ in range(length))
+
+
+_conf = getattr(settings, "MEETING_CODES", {})
+code_pool = CodePool(
+    length=_conf.get("LENGTH", 8),
+    batch_size=_conf.get("BATCH_SIZE", 200),
+    local_size=_conf.get("LOCAL_SIZE", 20),
+    retries=_conf.get("RETRIES", 5),
+    redis_url=_conf.get("REDIS_URL"),
+)
+
+REGISTRY.add_collector(lambda: {
+    "meeting_code_pool_size": ("gauge", "Codes held by this worker", code_pool.size()),
+})
@@ -1,160 +1,563 @@
-import json
+import asyncio
+import logging
+import time
+from urllib.parse import parse_qs
+from channels.exceptions import ChannelFull
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
 from django.utils import timezone
-from .models import Meeting
+from . import codec
+from .attendance import attendance_log
+from .cache import meeting_cache
+from .history import archive_history, backfill_frame, get_history
+from .metrics import REGISTRY
+from .models import AttendanceSession, Meeting
+from .outbox import Outbox
+from .registry import get_registry
+from .throttle import Throttle
+from .tokens import HOST, SPEAKER, issue_join_token, verify_join_token
+from .workerstats import worker_stats
+
+MESSAGE_TYPES = {
+    "presence", "leave", "chat", "hand", "screenshare",
+    "offer", "answer", "candidate", "end_meeting", "roster", "roster_page", "ack",
+}
+
+# close codes after which the client gives up instead of reconnecting
+# (static/js/meeting_rtc.js); 4008 (fell behind) is not one of them
+CLOSE_BAD_TOKEN = 4401
+CLOSE_MEETING_GONE = 4404
+
+WS_MESSAGES = REGISTRY.counter("ws_messages_total", "Frames received, by type", ("type",))
+WS_REJECTED = REGISTRY.counter("ws_rejected_total", "Frames dropped as undecodable or not JSON-compatible")
+WS_HANDLER_SECONDS = REGISTRY.histogram("ws_handler_seconds", "receive() latency, by type", ("type",))
+LAYER_SECONDS = REGISTRY.histogram("channel_layer_seconds", "Channel layer call latency", ("op",))
+WS_CONNECTIONS = REGISTRY.gauge("ws_connections", "Open meeting sockets on this worker")
+WS_ROOMS = REGISTRY.gauge("ws_rooms", "Meetings with a socket on this worker")
+WS_THROTTLED = REGISTRY.counter(
+    "ws_throttled_total", "Frames dropped by rate limits, by type and limit", ("type", "scope")
+)
+WS_DEDUPED = REGISTRY.counter("ws_presence_deduped_total", "Repeated presence frames dropped")
+WS_COALESCED = REGISTRY.counter("ws_candidates_coalesced_total", "Candidates sent inside a batch frame")
+WS_ROSTERS = REGISTRY.counter("ws_roster_replies_total", "Roster replies, full list or delta", ("kind",))
+WS_REJOINS = REGISTRY.counter("ws_rejoins_total", "Clients back within the reconnect grace period")
+WS_COUNT_FRAMES = REGISTRY.counter("ws_roster_count_frames_total", "Head-count frames sent in large rooms")
+LAYER_FULL = REGISTRY.counter(
+    "channel_layer_full_total", "Layer messages refused or dropped by a full channel, by operation", ("op",)
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GroupSendOverflow(logging.Filter):
+    """
+    channels_redis drops group messages to full channels and only logs how
+    many; count them instead of logging them.
+    """
+
+    def filter(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith("%s of %s channels over capacity"):
+            LAYER_FULL.inc(record.args[0], op="group_send")
+            return False
+        return True
+
+
+_layer_logger = logging.getLogger("channels_redis.core")
+_layer_logger.addFilter(GroupSendOverflow())
+if not _layer_logger.isEnabledFor(logging.INFO):
+    # the overflow record is logged at INFO
+    _layer_logger.setLevel(logging.INFO)
+
+# names end up in AttendanceSession; longer ones would fail its flush
+NAME_MAX_LENGTH = AttendanceSession._meta.get_field("name").max_length
+
+local_rooms = {}
+# deferred leaves of sockets in their reconnect grace period
+grace_tasks = set()
+# large rooms: the sockets on this worker, and the task sending them head counts
+audiences = {}
+count_tasks = {}
+
+
+async def room_counts(registry, code):
+    return {
+        "type": "roster_count",
+        "speakers": await registry.count(code),
+        "attendees": await registry.count(f"{code}:audience"),
+    }
+
+
+async def send_counts(registry, code, interval):
+    # one loop per room and worker, so a join costs nothing until the next tick
+    last = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            frame = await room_counts(registry, code)
+            if frame == last:
+                continue
+            last = frame
+            consumers = list(audiences.get(code, ()))
+            for consumer in consumers:
+                await consumer.send_frame(frame)
+            WS_COUNT_FRAMES.inc(len(consumers))
+        except Exception:
+            # a registry hiccup must not stop the counts for the rest of the meeting
+            logger.exception("sending head counts failed", extra={"event": "ws.count_failed", "meeting_code": code})
+
 
 class MeetingConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.code = self.scope["url_route"]["kwargs"]["code"]
         self.group_name = f"meet_{self.code}"
+        self.registry = get_registry()
+        self.history = get_history()
+        self.heartbeat_task = None
+        self.counted = False
+        self.meeting_id = None
+        self.attending = None
+        self.large = False
+        self.speaker = True
+        self.audience_room = f"{self.code}:audience"
+        self.roster_room = self.code
+        self.stage_group = self.group_name
+        self.chat_group = f"{self.group_name}_chat"
+        self.chat_layer = None
+        self.chat_channel = None
+        self.chat_task = None
+
+        conf = getattr(settings, "MEETING_THROTTLE", {})
+        self.throttle = Throttle(self.code, conf.get("LIMITS", {}))
+        self.candidate_window = conf.get("CANDIDATE_WINDOW", 0)
+        self.presence_dedup = conf.get("PRESENCE_DEDUP_SECONDS", 0)
+        self.last_presence = None
+        self.pending_candidates = {}
+        self.flush_task = None
+        self.reconnect_grace = getattr(settings, "MEETING_RECONNECT_GRACE", 0)
+        # group events only queue here; a writer task sends them in priority order
+        conf = getattr(settings, "MEETING_OUTBOX", {})
+        self.outbox = Outbox(
+            self.send,
+            max_frames=conf.get("MAX_FRAMES", 256),
+            stale_after=conf.get("CANDIDATE_STALE_SECONDS", 10),
+            evict_after=conf.get("EVICT_AFTER", 15),
+            window=conf.get("WINDOW", 64),
+        )
+        self.outbox_task = None
+        # MessagePack frames instead of JSON text, if the client asks for it
+        self.binary = codec.msgpack is not None and codec.BINARY_SUBPROTOCOL in self.scope.get("subprotocols", ())
 
-        if not self.scope["session"].get(f"meet_ok:{self.code}", False):
-            await self.close()
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        claims = verify_join_token(query.get("token", [None])[0], self.code)
+        if claims is None:
+            await self.refuse(CLOSE_BAD_TOKEN)
             return
+        self.client_id, self.role = claims
 
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        meeting = await meeting_cache.aget(self.code)
+        if meeting is None or meeting.host_status == 2:
+            await self.refuse(CLOSE_MEETING_GONE)
+            return
+        self.meeting_id = meeting.id
 
-        if not hasattr(self.channel_layer, "participants"):
-            self.channel_layer.participants = {}
-        self.channel_layer.participants.setdefault(self.group_name, {})
+        if meeting.large_room:
+            # attendees keep their own roster and are only counted; signaling
+            # to unknown peers goes to the speakers' stage group
+            self.speaker = self.role in (HOST, SPEAKER)
+            self.stage_group = f"{self.group_name}_stage"
+            if not self.speaker:
+                self.roster_room = self.audience_room
 
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        if self.speaker and self.stage_group != self.group_name:
+            await self.channel_layer.group_add(self.stage_group, self.channel_name)
+        # chat and hands arrive on a second channel, from the "chat" layer when
+        # one is configured, so they are bounded apart from signaling
+        self.chat_layer = get_channel_layer("chat") or self.channel_layer
+        self.chat_channel = await self.chat_layer.new_channel(prefix="chat")
+        await self.chat_layer.group_add(self.chat_group, self.chat_channel)
+        await self.accept(subprotocol=codec.BINARY_SUBPROTOCOL if self.binary else None)
+        self.outbox_task = asyncio.create_task(self.outbox.run())
+        self.chat_task = asyncio.create_task(self.receive_chat())
+        if meeting.large_room:
+            self.large = True
+            audiences.setdefault(self.code, set()).add(self)
+            if self.code not in count_tasks:
+                conf = getattr(settings, "MEETING_LARGE_ROOM", {})
+                count_tasks[self.code] = asyncio.create_task(
+                    send_counts(self.registry, self.code, conf.get("COUNT_INTERVAL", 2))
+                )
+        events = await self.history.recent(self.code)
+        if events:
+            frame = backfill_frame(events)
+            if self.binary:
+                self.outbox.put("backfill", {"bytes_data": codec.packb(codec.loads(frame))})
+            else:
+                self.outbox.put("backfill", {"text_data": frame})
+        worker_stats.opened()
+        self.counted = True
+        WS_CONNECTIONS.inc()
+        local_rooms[self.code] = local_rooms.get(self.code, 0) + 1
+        WS_ROOMS.set(len(local_rooms))
+
+    async def refuse(self, code):
+        # a close before accept() reaches the browser as 1006, like a network
+        # error; accepting first lets it see why and stop reconnecting
         await self.accept()
+        await self.close(code=code)
 
     async def disconnect(self, close_code):
-        group_participants = self.channel_layer.participants.get(self.group_name, {})
-        info = group_participants.pop(self.channel_name, None)
+        if self.counted:
+            worker_stats.closed()
+            WS_CONNECTIONS.dec()
+            local_rooms[self.code] -= 1
+            if not local_rooms[self.code]:
+                del local_rooms[self.code]
+                Throttle.forget_room(self.code)
+            WS_ROOMS.set(len(local_rooms))
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        if self.flush_task:
+            self.flush_task.cancel()
+        if self.outbox_task:
+            self.outbox_task.cancel()
+            self.outbox.clear()
+        if self.chat_task:
+            self.chat_task.cancel()
+        if self.large:
+            room = audiences[self.code]
+            room.discard(self)
+            if not room:
+                del audiences[self.code]
+                count_tasks.pop(self.code).cancel()
+        announced = self.attending is not None
+        self.record_leave()
 
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.speaker and self.stage_group != self.group_name:
+            await self.channel_layer.group_discard(self.stage_group, self.channel_name)
+        if self.chat_channel:
+            await self.chat_layer.group_discard(self.chat_group, self.chat_channel)
 
-        if info:
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "presence.leave",
-                    "payload": {
-                        "clientId": info.get("clientId"),
-                        "name": info.get("name") or "Peer",
-                    },
-                },
-            )
+        if announced and self.reconnect_grace:
+            # keep the roster entry for a moment: if the same clientId comes
+            # back its join takes the entry over and nobody sees leave/join
+            await self.registry.heartbeat(self.roster_room, self.channel_name, ttl=self.reconnect_grace * 2)
+            task = asyncio.create_task(self.leave_after_grace())
+            grace_tasks.add(task)
+            task.add_done_callback(grace_tasks.discard)
+        else:
+            await self.leave_room()
 
     async def receive(self, text_data=None, bytes_data=None):
-        msg = json.loads(text_data or "{}")
-        t = msg.get("type")
+        # raw is kept so signaling frames can be forwarded as received
+        try:
+            if bytes_data is not None:
+                msg, raw = codec.unpackb(bytes_data), {"bytes": bytes_data}
+            else:
+                msg, raw = codec.loads(text_data or "{}"), {"text": text_data}
+        except ValueError:
+            WS_REJECTED.inc()
+            return
+        if not isinstance(msg, dict):
+            return
+        # binary frames are relayed to JSON clients too: bytes values or
+        # non-string keys would not survive the conversion
+        if bytes_data is not None and not codec.plain(msg):
+            WS_REJECTED.inc()
+            return
+        # these end up in set lookups and dict keys: a list would raise
+        if not isinstance(msg.get("type"), str) or any(
+            not isinstance(msg.get(k), (str, type(None))) for k in ("to", "from")
+        ):
+            WS_REJECTED.inc()
+            return
+        t = msg["type"]
+        label = t if t in MESSAGE_TYPES else "other"
+        WS_MESSAGES.inc(type=label)
+
+        scope = self.throttle.check(t)
+        if scope:
+            WS_THROTTLED.inc(type=label, scope=scope)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.handle_message(t, msg, raw)
+        finally:
+            WS_HANDLER_SECONDS.observe(time.perf_counter() - started, type=label)
 
+    async def handle_message(self, t, msg, raw):
         if t == "presence":
-            client_id = msg.get("clientId")
-            name = (msg.get("name") or "Peer").strip() or "Peer"
+            # the id is the one the join token was issued for
+            client_id = self.client_id
+            name = (str(msg.get("name") or "").strip() or "Peer")[:NAME_MAX_LENGTH]
 
-            group_participants = self.channel_layer.participants.setdefault(self.group_name, {})
-            group_participants[self.channel_name] = {"clientId": client_id, "name": name}
+            # the same announcement again only refreshes our registry entry
+            key = (client_id, name, bool(msg.get("is_host")))
+            now = time.monotonic()
+            if self.last_presence and self.last_presence[0] == key and now - self.last_presence[1] < self.presence_dedup:
+                WS_DEDUPED.inc()
+                await self.registry.heartbeat(self.roster_room, self.channel_name)
+                return
+            self.last_presence = (key, now)
+
+            version, rejoined = await self.registry.join(self.roster_room, self.channel_name, client_id, name)
+            if self.heartbeat_task is None:
+                self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
             if msg.get("is_host"):
-                try:
-                    mt = Meeting.objects.get(meeting_code=self.code)
-                    if mt.host_status == 0:
-                        mt.host_status = 1
-                        mt.started_on = timezone.now()
-                        mt.save(update_fields=["host_status", "started_on"])
-                except Meeting.DoesNotExist:
-                    pass
-
-            participants_payload = [
-                v for _, v in group_participants.items()
-            ]
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "type": "participant_list",
-                        "participants": participants_payload,
-                    }
-                )
-            )
+                meeting = await meeting_cache.aget(self.code)
+                if meeting and meeting.host_status == 0:
+                    await Meeting.objects.filter(meeting_code=self.code, host_status=0).aupdate(
+                        host_status=1, started_on=timezone.now()
+                    )
+                    await meeting_cache.ainvalidate(self.code)
+
+            if self.attending is None:
+                self.attending = (name, timezone.now())
+                concurrent = await self.registry.count(self.code)
+                if self.large:
+                    concurrent += await self.registry.count(self.audience_room)
+                attendance_log.joined(self.meeting_id, concurrent)
 
-            await self.channel_layer.group_send(
-                self.group_name,
+            # a reconnecting client sends the roster version it last saw;
+            # in a large room this is the speakers' roster, plus the head count
+            await self.send_roster(msg.get("since"))
+            if self.large:
+                await self.send_frame(await room_counts(self.registry, self.code))
+            if rejoined:
+                WS_REJOINS.inc()
+                return
+            if not self.speaker:
+                return
+
+            await self.group_send(
                 {
                     "type": "presence.join",
-                    "payload": {
+                    **self.pack({
+                        "type": "presence",
                         "clientId": client_id,
                         "name": name,
-                    },
+                        "version": version,
+                    }),
                 },
             )
             return
 
-        if t == "leave":
-            group_participants = self.channel_layer.participants.get(self.group_name, {})
-            info = group_participants.pop(self.channel_name, None)
-            if info:
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        "type": "presence.leave",
-                        "payload": {
-                            "clientId": info.get("clientId"),
-                            "name": info.get("name") or "Peer",
-                        },
-                    },
-                )
+        if t == "ack":
+            self.outbox.ack(msg.get("received"))
             return
 
-        if t == "chat":
-            await self.channel_layer.group_send(
-                self.group_name, {"type": "chat.broadcast", "payload": msg}
-            )
+        if t == "roster":
+            await self.send_roster(msg.get("since"))
             return
 
-        if t == "hand":
-            await self.channel_layer.group_send(
-                self.group_name, {"type": "hand.broadcast", "payload": msg}
+        if t == "roster_page":
+            audience = self.large and bool(msg.get("audience"))
+            cursor = msg.get("cursor")
+            if not isinstance(cursor, int) or cursor < 0:
+                cursor = 0
+            participants, cursor = await self.registry.page(
+                self.audience_room if audience else self.code, cursor,
+                getattr(settings, "MEETING_LARGE_ROOM", {}).get("PAGE_SIZE", 100),
+            )
+            await self.send_frame(
+                {"type": "roster_page", "audience": audience, "participants": participants, "cursor": cursor}
             )
             return
 
+        if t == "leave":
+            # so that announcing again after leaving joins the roster again
+            self.last_presence = None
+            self.record_leave()
+            await self.leave_room()
+            return
+
+        if t in ("chat", "hand"):
+            event = {**msg, "type": t, "ts": time.time()}
+            await self.group_send({"type": f"{t}.broadcast", **self.pack(event)}, self.chat_group, self.chat_layer)
+            await self.history.append(self.code, codec.dumps(event))
+            return
+
         if t == "screenshare":
-            await self.channel_layer.group_send(
-                self.group_name, {"type": "screenshare.broadcast", "payload": msg}
+            await self.group_send(
+                {"type": "screenshare.broadcast", **self.pack({**msg, "type": "screenshare"})}
             )
             return
 
+        if t == "candidate" and self.candidate_window:
+            key = (msg.get("from"), msg.get("to"))
+            self.pending_candidates.setdefault(key, []).append(msg.get("candidate"))
+            if self.flush_task is None:
+                self.flush_task = asyncio.create_task(self.flush_candidates())
+            return
+
         if t in ("offer", "answer", "candidate"):
-            await self.channel_layer.group_send(
-                self.group_name, {"type": "signal.broadcast", "payload": msg}
-            )
+            await self.signal(t, msg.get("to"), raw)
             return
 
         if t == "end_meeting":
-            try:
-                mt = Meeting.objects.get(meeting_code=self.code)
-                mt.host_status = 2
-                mt.save(update_fields=["host_status"])
-            except Meeting.DoesNotExist:
-                pass
-
-            await self.channel_layer.group_send(
-                self.group_name, {"type": "end.broadcast", "payload": {"msg": "Meeting ended"}}
+            # only the host's socket may end the meeting for everyone
+            if self.role != HOST:
+                return
+            await Meeting.objects.filter(meeting_code=self.code).aupdate(host_status=2)
+            await meeting_cache.ainvalidate(self.code)
+
+            await self.group_send(
+                {"type": "end.broadcast", **self.pack({"type": "end_meeting"})}
+            )
+            await archive_history(self.meeting_id, self.code)
+            return
+
+
+    async def signal(self, kind, to, payload):
+        event = {"type": "signal.broadcast", "kind": kind, **payload}
+        target = await self.registry.lookup(self.code, to)
+        if target is None and self.large:
+            target = await self.registry.lookup(self.audience_room, to)
+        if target:
+            await self.channel_send(target, event)
+        else:
+            # unknown target (not announced yet / other worker): fall back to the room
+            await self.group_send(event, self.stage_group)
+
+    async def flush_candidates(self):
+        await asyncio.sleep(self.candidate_window)
+        pending, self.pending_candidates = self.pending_candidates, {}
+        self.flush_task = None
+        for (sender, to), candidates in pending.items():
+            if len(candidates) == 1:
+                frame = {"type": "candidate", "from": sender, "to": to, "candidate": candidates[0]}
+            else:
+                WS_COALESCED.inc(len(candidates))
+                frame = {"type": "candidate_batch", "from": sender, "to": to, "candidates": candidates}
+            await self.signal(frame["type"], to, self.pack(frame))
+
+    async def send_roster(self, since=None):
+        if isinstance(since, int):
+            version, changes = await self.registry.changes(self.code, since)
+            if changes is not None:
+                WS_ROSTERS.inc(kind="delta")
+                await self.send_frame({"type": "roster_delta", "version": version, "changes": changes})
+                return
+
+        version, participants = await self.registry.roster(self.code)
+        WS_ROSTERS.inc(kind="full")
+        await self.send_frame({"type": "participant_list", "version": version, "participants": participants})
+
+    async def leave_room(self):
+        info, version = await self.registry.leave(self.roster_room, self.channel_name)
+        if info and self.speaker:
+            await self.group_send(
+                {
+                    "type": "presence.leave",
+                    **self.pack({
+                        "type": "leave",
+                        "clientId": info.get("clientId"),
+                        "name": info.get("name") or "Peer",
+                        "version": version,
+                    }),
+                },
             )
+
+    async def leave_after_grace(self):
+        await asyncio.sleep(self.reconnect_grace)
+        # still ours, so the client did not come back on another socket
+        if await self.registry.lookup(self.roster_room, self.client_id) == self.channel_name:
+            await self.leave_room()
+
+    def record_leave(self):
+        if self.attending is None:
             return
+        name, joined_at = self.attending
+        self.attending = None
+        attendance_log.left(self.meeting_id, self.client_id, name, joined_at, timezone.now())
+
+    def pack(self, frame):
+        """Event fields for a frame, encoded the way this client talks."""
+        if self.binary:
+            return {"bytes": codec.packb(frame)}
+        return {"text": codec.dumps(frame)}
+
+    async def send_frame(self, frame):
+        if self.binary:
+            await self.enqueue(frame["type"], {"bytes_data": codec.packb(frame)})
+        else:
+            await self.enqueue(frame["type"], {"text_data": codec.dumps(frame)})
+
+    async def forward(self, event, kind):
+        # as encoded by the sender; converted only between JSON and binary clients
+        try:
+            if self.binary:
+                data = event.get("bytes")
+                data = {"bytes_data": data if data is not None else codec.packb(codec.loads(event["text"]))}
+            else:
+                text = event.get("text")
+                data = {"text_data": text if text is not None else codec.dumps(codec.unpackb(event["bytes"]))}
+        except (TypeError, ValueError):
+            # never let one sender's frame take down the recipients' consumers
+            WS_REJECTED.inc()
+            return
+        await self.enqueue(kind, data)
+
+    async def enqueue(self, kind, data):
+        if not self.outbox.put(kind, data):
+            # behind for too long: drop the client, it reconnects and resyncs
+            await self.close(code=4008)
+
+    async def group_send(self, event, group=None, layer=None):
+        started = time.perf_counter()
+        await (layer or self.channel_layer).group_send(group or self.group_name, event)
+        LAYER_SECONDS.observe(time.perf_counter() - started, op="group_send")
+
+    async def channel_send(self, channel, event):
+        started = time.perf_counter()
+        try:
+            await self.channel_layer.send(channel, event)
+        except ChannelFull:
+            # the peer's socket is not keeping up; it is evicted on its side
+            LAYER_FULL.inc(op="send")
+        LAYER_SECONDS.observe(time.perf_counter() - started, op="send")
+
+    async def receive_chat(self):
+        handlers = {"chat.broadcast": self.chat_broadcast, "hand.broadcast": self.hand_broadcast}
+        while True:
+            event = await self.chat_layer.receive(self.chat_channel)
+            handler = handlers.get(event.get("type"))
+            if handler:
+                await handler(event)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.registry.ttl / 3)
+            await self.registry.heartbeat(self.roster_room, self.channel_name)
+            # keep the client holding a fresh token for reconnecting
+            token, _ = issue_join_token(self.code, self.client_id, self.role)
+            await self.send_frame({"type": "token", "token": token})
 
+    # group events carry the frame already encoded by the sender ("text" or
+    # "bytes"), so each recipient only forwards it
 
     async def presence_join(self, event):
-        await self.send(text_data=json.dumps({"type": "presence", **event["payload"]}))
+        await self.forward(event, "presence")
 
     async def presence_leave(self, event):
-        await self.send(text_data=json.dumps({"type": "leave", **event["payload"]}))
+        await self.forward(event, "leave")
 
     async def chat_broadcast(self, event):
-        await self.send(text_data=json.dumps({"type": "chat", **event["payload"]}))
+        await self.forward(event, "chat")
 
     async def hand_broadcast(self, event):
-        await self.send(text_data=json.dumps({"type": "hand", **event["payload"]}))
+        await self.forward(event, "hand")
 
     async def screenshare_broadcast(self, event):
-        await self.send(text_data=json.dumps({"type": "screenshare", **event["payload"]}))
+        await self.forward(event, "screenshare")
 
     async def signal_broadcast(self, event):
-        await self.send(text_data=json.dumps(event["payload"]))
+        await self.forward(event, event.get("kind"))
 
     async def end_broadcast(self, event):
-        await self.send(text_data=json.dumps({"type": "end_meeting"}))
+        await self.forward(event, "end_meeting")
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db import connections
+
+
+def pool_stats(alias="default"):
+    """Connection settings and usage for one database alias."""
+    connection = connections[alias]
+    stats = {
+        "alias": alias,
+        "vendor": connection.vendor,
+        "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+        "pooled": False,
+    }
+
+    pool = getattr(connection, "pool", None)  # postgres with OPTIONS["pool"]
+    if pool is not None:
+        stats["pooled"] = True
+        stats.update(pool.get_stats())
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+            )
+            stats["server_connections"] = cursor.fetchone()[0]
+        elif connection.vendor == "mysql":
+            cursor.execute("SHOW STATUS LIKE 'Threads_connected'")
+            stats["server_connections"] = int(cursor.fetchone()[1])
+        elif connection.vendor == "sqlite":
+            cursor.execute("PRAGMA journal_mode")
+            stats["journal_mode"] = cursor.fetchone()[0]
+            cursor.execute("PRAGMA busy_timeout")
+            stats["busy_timeout"] = cursor.fetchone()[0]
+    return stats
+
+
+def approximate_count(model, ttl=300):
+    """
+    Row count for page headers, from the planner statistics where the
+    backend keeps them (falls back to COUNT(*)), cached for ``ttl`` seconds.
+    """
+    key = f"approx_count:{model._meta.db_table}"
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    connection = connections[model.objects.db]
+    table = model._meta.db_table
+    count = None
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            count = row[0] if row and row[0] >= 0 else None
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+            count = row[0] if row else None
+    if count is None:
+        count = model.objects.count()
+    cache.set(key, count, ttl)
+    return count
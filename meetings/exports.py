@@ -0,0 +1,161 @@
+import csv
+import json
+from datetime import datetime, time
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Meeting, Participant, ParticipantArchive
+
+
+def _meeting_column(name):
+    # ParticipantArchive keeps a plain meeting_id, not a foreign key
+    return Subquery(Meeting.objects.filter(id=OuterRef("meeting_id")).values(name)[:1])
+
+
+EXPORTS = {
+    "attendance": {
+        "model": Participant,
+        "date_field": "joined_at",
+        "code_field": "meeting__meeting_code",
+        "fields": [
+            ("meeting_code", "meeting__meeting_code"),
+            ("host_name", "meeting__host_name"),
+            ("meeting_started_on", "meeting__started_on"),
+            ("name", "name"),
+            ("designation", "designation"),
+            ("joined_at", "joined_at"),
+        ],
+        "order_by": ("meeting_id", "joined_at", "id"),
+        # rows the lifecycle command moved out of Participant, exported
+        # first: archived meetings are the older ones
+        "archive": {
+            "model": ParticipantArchive,
+            "date_field": "joined_at",
+            "code_field": "meeting_code",
+            "annotate": {
+                "host_name": _meeting_column("host_name"),
+                "meeting_started_on": _meeting_column("started_on"),
+            },
+            "lookups": ("meeting_code", "host_name", "meeting_started_on", "name", "designation", "joined_at"),
+            "order_by": ("meeting_id", "joined_at", "id"),
+        },
+    },
+    "meetings": {
+        "model": Meeting,
+        "date_field": "started_on",
+        "code_field": "meeting_code",
+        "fields": [
+            ("meeting_code", "meeting_code"),
+            ("host_name", "host_name"),
+            ("host_designation", "host_designation"),
+            ("host_status", "host_status"),
+            ("started_on", "started_on"),
+        ],
+        "order_by": ("started_on", "id"),
+    },
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def parse_day(value, end=False):
+    """
+    'YYYY-MM-DD' -> aware datetime at the start (or end) of that day; None
+    without a value. Raises ValueError for anything else, 2024-13-45 too.
+    """
+    if not value:
+        return None
+    day = parse_date(value)  # None if malformed, ValueError if not a real date
+    if day is None:
+        raise ValueError(f"{value!r} is not a YYYY-MM-DD date")
+    return timezone.make_aware(datetime.combine(day, time.max if end else time.min))
+
+
+def _queryset(spec, start, end, codes):
+    qs = spec["model"].objects.annotate(**spec.get("annotate", {}))
+    if start:
+        qs = qs.filter(**{f"{spec['date_field']}__gte": start})
+    if end:
+        qs = qs.filter(**{f"{spec['date_field']}__lte": end})
+    if codes:
+        qs = qs.filter(**{f"{spec['code_field']}__in": codes})
+    lookups = spec.get("lookups") or [lookup for _, lookup in spec["fields"]]
+    return qs.order_by(*spec["order_by"]).values_list(*lookups)
+
+
+def export_rows(kind, start=None, end=None, codes=None, chunk_size=2000):
+    """Yield one tuple per row, reading the table in chunks of ``chunk_size``."""
+    spec = EXPORTS[kind]
+    for source in filter(None, (spec.get("archive"), spec)):
+        yield from _queryset(source, start, end, codes).iterator(chunk_size=chunk_size)
+
+
+async def aexport_rows(kind, start=None, end=None, codes=None, chunk_size=2000):
+    """
+    export_rows() for ASGI responses: one thread hop per chunk. Not
+    QuerySet.aiterator(), which runs a values_list() query on the event loop.
+    """
+    rows = None
+
+    def next_chunk():
+        nonlocal rows
+        if rows is None:
+            # created on the sync thread, which keeps the cursor for every chunk
+            rows = export_rows(kind, start, end, codes, chunk_size)
+        return list(islice(rows, chunk_size))
+
+    while True:
+        chunk = await sync_to_async(next_chunk)()
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            return
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _formatter(kind, fmt):
+    """The export's first line ("" if none) and a function formatting one row."""
+    header = [name for name, _ in EXPORTS[kind]["fields"]]
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        return writer.writerow(header), lambda row: writer.writerow([_cell(v) for v in row])
+    if fmt == "jsonl":
+        return "", lambda row: json.dumps(dict(zip(header, map(_cell, row)))) + "\n"
+    raise ValueError(f"unknown export format {fmt!r}")
+
+
+def render(kind, rows, fmt):
+    """Yield the export as text chunks, one line at a time."""
+    head, line = _formatter(kind, fmt)
+    if head:
+        yield head
+    for row in rows:
+        yield line(row)
+
+
+async def arender(kind, rows, fmt, batch=500):
+    """render() over async ``rows``, ``batch`` lines per chunk to keep sends few."""
+    head, line = _formatter(kind, fmt)
+    lines = [head] if head else []
+    async for row in rows:
+        lines.append(line(row))
+        if len(lines) >= batch:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
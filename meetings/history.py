@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import codec
+from .metrics import REGISTRY
+from .models import ChatMessage
+
+ARCHIVED = REGISTRY.counter("chat_archived_total", "Chat/hand events archived to the database")
+
+
+class InMemoryChatHistory:
+    """
+    Recent chat and hand events per room, newest ``size`` kept. Rooms are
+    evicted least recently used beyond ``max_rooms``. One process only.
+    """
+
+    def __init__(self, size=50, max_rooms=1000, **kwargs):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.rooms = OrderedDict()
+
+    async def append(self, room, text):
+        events = self.rooms.get(room)
+        if events is None:
+            events = self.rooms[room] = deque(maxlen=self.size)
+            while len(self.rooms) > self.max_rooms:
+                self.rooms.popitem(last=False)
+        self.rooms.move_to_end(room)
+        events.append(text)
+
+    async def recent(self, room):
+        return list(self.rooms.get(room, ()))
+
+    async def drain(self, room):
+        return list(self.rooms.pop(room, ()))
+
+
+class RedisChatHistory:
+    """Recent events in a Redis list per room, trimmed on every append."""
+
+    def __init__(self, hosts=None, size=50, ttl=86400, prefix="connectly:chat", **kwargs):
+        self.hosts = hosts or ["redis://127.0.0.1:6379"]
+        self.size = size
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.Redis.from_url(self.hosts[0], decode_responses=True)
+        return self._redis
+
+    def key(self, room):
+        return f"{self.prefix}:{room}"
+
+    async def append(self, room, text):
+        key = self.key(room)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, text)
+            pipe.ltrim(key, -self.size, -1)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def recent(self, room):
+        return await self.redis.lrange(self.key(room), 0, -1)
+
+    async def drain(self, room):
+        key = self.key(room)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            events, _ = await pipe.execute()
+        return events
+
+
+def backfill_frame(events):
+    """One frame holding the stored events, which are already encoded."""
+    return '{"type":"backfill","messages":[' + ",".join(events) + "]}"
+
+
+async def archive_history(meeting_id, code):
+    """Take the room's buffer and, with CHAT_HISTORY["ARCHIVE"] on, bulk-insert it."""
+    events = await get_history().drain(code)
+    if not events or not getattr(settings, "CHAT_HISTORY", {}).get("ARCHIVE", False):
+        return 0
+    rows = []
+    for text in events:
+        event = codec.loads(text)
+        rows.append(ChatMessage(
+            meeting_id=meeting_id,
+            kind=event.get("type", "chat"),
+            name=str(event.get("name") or "")[:128],
+            text=str(event.get("text") or ""),
+            sent_at=_from_ts(event.get("ts")),
+        ))
+    await ChatMessage.objects.abulk_create(rows)
+    ARCHIVED.inc(len(rows))
+    return len(rows)
+
+
+def _from_ts(ts):
+    return datetime.fromtimestamp(ts if isinstance(ts, (int, float)) else time.time(), tz=timezone.utc)
+
+
+_history = None
+
+
+def get_history():
+    global _history
+    if _history is None:
+        conf = getattr(settings, "CHAT_HISTORY", {})
+        backend = import_string(conf.get("BACKEND", "meetings.history.InMemoryChatHistory"))
+        _history = backend(**conf.get("CONFIG", {}))
+    return _history
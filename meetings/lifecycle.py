@@ -0,0 +1,168 @@
+"""
+Moves meetings that nobody will end by hand to "Ended":
+
+* unstarted - scheduled (host_status=0) but not started within SCHEDULE_GRACE
+* stale     - running (host_status=1) for longer than MAX_DURATION
+* abandoned - running, but with nobody in the participant registry (nor
+              in a large room's audience) for ABANDON_AFTER seconds in a row;
+              only checked with a registry shared between processes, since
+              the sweep runs in its own
+
+and optionally moves Participant rows of ended meetings that started more
+than ARCHIVE_AFTER_DAYS ago into ParticipantArchive (Meeting records no end
+time). The attendance export and the admin meeting page read both tables. Driven by the lifecycle
+management command.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import codec
+from .cache import meeting_cache
+from .history import archive_history
+from .metrics import REGISTRY
+from .models import Meeting, Participant, ParticipantArchive
+from .registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+MEETINGS_ENDED = REGISTRY.counter("lifecycle_meetings_ended_total", "Meetings ended by the sweeper", ("reason",))
+PARTICIPANTS_ARCHIVED = REGISTRY.counter("lifecycle_participants_archived_total", "Participant rows archived")
+
+
+class Lifecycle:
+    def __init__(self, schedule_grace=7200, max_duration=86400, abandon_after=600,
+                 archive_after_days=None, batch_size=500):
+        self.schedule_grace = schedule_grace
+        self.max_duration = max_duration
+        self.abandon_after = abandon_after
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self.registry = get_registry()
+        self.channel_layer = get_channel_layer()
+        # a per-process registry is always empty here
+        self.check_abandoned = getattr(self.registry, "shared", False)
+        # meeting code -> monotonic time it was first seen empty
+        self.empty_since = {}
+
+    async def sweep(self):
+        now = timezone.now()
+        ended = {
+            "unstarted": await self.end_where(
+                "unstarted", host_status=0, started_on__lt=now - timedelta(seconds=self.schedule_grace)
+            ),
+            "stale": await self.end_where(
+                "stale", host_status=1, started_on__lt=now - timedelta(seconds=self.max_duration)
+            ),
+            "abandoned": await self.end_abandoned(),
+        }
+        archived = 0
+        if self.archive_after_days:
+            archived = await sync_to_async(self.archive)(now - timedelta(days=self.archive_after_days))
+        logger.info("lifecycle sweep", extra={"event": "lifecycle.sweep", "archived": archived, **ended})
+        return {**ended, "archived": archived}
+
+    async def end_where(self, reason, **filters):
+        # index range scan on (host_status, started_on), one batch at a time
+        total = 0
+        while True:
+            rows = [
+                row async for row in Meeting.objects.filter(**filters)
+                .order_by("started_on").values_list("id", "meeting_code")[:self.batch_size]
+            ]
+            if not rows:
+                return total
+            total += await self.end(reason, rows, filters["host_status"])
+            if len(rows) < self.batch_size:
+                return total
+
+    async def end_abandoned(self):
+        if not self.check_abandoned:
+            return 0
+        # nothing that started within abandon_after can have been empty that
+        # long; the rest is read a page at a time along (host_status, started_on)
+        running = Meeting.objects.filter(
+            host_status=1, started_on__lt=timezone.now() - timedelta(seconds=self.abandon_after)
+        ).order_by("started_on", "id")
+
+        now = time.monotonic()
+        seen, total, after = set(), 0, None
+        while True:
+            page = running
+            if after:
+                page = page.filter(Q(started_on__gt=after[0]) | Q(started_on=after[0], id__gt=after[1]))
+            rows = [row async for row in page.values_list("id", "meeting_code", "started_on")[:self.batch_size]]
+            if not rows:
+                break
+            occupied = await asyncio.gather(*(self.occupied(code) for _, code, _ in rows))
+
+            abandoned = []
+            for (pk, code, _), busy in zip(rows, occupied):
+                seen.add(code)
+                if busy:
+                    self.empty_since.pop(code, None)
+                elif now - self.empty_since.setdefault(code, now) >= self.abandon_after:
+                    abandoned.append((pk, code))
+            if abandoned:
+                total += await self.end("abandoned", abandoned, 1)
+            if len(rows) < self.batch_size:
+                break
+            after = (rows[-1][2], rows[-1][0])
+
+        for code in set(self.empty_since) - seen:
+            del self.empty_since[code]
+        return total
+
+    async def occupied(self, code):
+        # a large room's attendees are in a roster of their own
+        return bool(
+            await self.registry.participants(code)
+            or await self.registry.participants(f"{code}:audience")
+        )
+
+    async def end(self, reason, rows, from_status):
+        ids = [pk for pk, _ in rows]
+        # the status guard skips meetings that changed since they were read
+        count = await Meeting.objects.filter(id__in=ids, host_status=from_status).aupdate(host_status=2)
+        if count < len(ids):
+            rows = [row async for row in Meeting.objects.filter(id__in=ids, host_status=2).values_list("id", "meeting_code")]
+        for pk, code in rows:
+            self.empty_since.pop(code, None)
+            await archive_history(pk, code)
+            await meeting_cache.ainvalidate(code)
+            await self.channel_layer.group_send(
+                f"meet_{code}", {"type": "end.broadcast", "text": codec.dumps({"type": "end_meeting"})}
+            )
+        MEETINGS_ENDED.inc(count, reason=reason)
+        return count
+
+    def archive(self, before):
+        archived = 0
+        while True:
+            rows = list(
+                Participant.objects.filter(meeting__host_status=2, meeting__started_on__lt=before)
+                .order_by("id")
+                .values_list("id", "meeting_id", "meeting__meeting_code", "name", "designation", "joined_at")
+                [:self.batch_size]
+            )
+            if not rows:
+                break
+            with transaction.atomic():
+                ParticipantArchive.objects.bulk_create([
+                    ParticipantArchive(
+                        meeting_id=meeting_id, meeting_code=code, name=name,
+                        designation=designation, joined_at=joined_at,
+                    )
+                    for _, meeting_id, code, name, designation, joined_at in rows
+                ])
+                Participant.objects.filter(id__in=[row[0] for row in rows]).delete()
+            archived += len(rows)
+        PARTICIPANTS_ARCHIVED.inc(archived)
+        return archived
@@ -0,0 +1,120 @@
+"""
+Logging plumbing: request threads only put records on a bounded queue and a
+QueueListener thread does the formatting and I/O. Wired up from
+settings.LOGGING.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+# attributes every LogRecord has; anything else came in through ``extra``
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extras."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RedactFilter(logging.Filter):
+    """
+    Masks credentials in extras (nested dicts, lists and tuples too), dict
+    arguments and text: ``key=value``, ``key: value`` and ``key value``.
+    """
+
+    SENSITIVE = ("password", "pwd", "passwd", "token", "secret", "sessionid", "csrf")
+    MASK = "***"
+
+    def __init__(self, keys=None):
+        super().__init__()
+        self.keys = tuple(keys or self.SENSITIVE)
+        self.pattern = re.compile(
+            r"(?i)(\b\w*(?:%s)\w*\b['\"]?(?:\s*[:=]\s*|\s+)['\"]?)[^\s,'\"}&]+"
+            % "|".join(map(re.escape, self.keys))
+        )
+
+    def sensitive(self, key):
+        key = str(key).lower()
+        return any(k in key for k in self.keys)
+
+    def scrub(self, value):
+        if isinstance(value, dict):
+            return {k: self.MASK if self.sensitive(k) else self.scrub(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.scrub(item) for item in value]
+        if isinstance(value, str):
+            return self.pattern.sub(lambda m: m.group(1) + self.MASK, value)
+        return value
+
+    def filter(self, record):
+        for key in list(vars(record)):
+            if key not in _STANDARD_ATTRS:
+                value = getattr(record, key)
+                setattr(record, key, self.MASK if self.sensitive(key) else self.scrub(value))
+        # scrub the rendered message, not the format string and its args
+        try:
+            message = record.getMessage()
+        except (TypeError, ValueError):
+            return True
+        record.msg, record.args = self.scrub(message), None
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keeps a fraction of high-frequency records. ``rates`` maps the record's
+    ``event`` extra to the share to keep (0.0-1.0); other records pass.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Never blocks the caller: records go on a bounded queue (dropped and
+    counted when it is full) and a background QueueListener writes them to
+    ``filename`` or stdout as JSON lines.
+    """
+
+    def __init__(self, filename=None, maxsize=10000, level=logging.NOTSET):
+        super().__init__(queue.Queue(maxsize))
+        self.setLevel(level)
+        target = logging.FileHandler(filename) if filename else logging.StreamHandler(sys.stdout)
+        target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from meetings import codec
+
+
+SAMPLES = {
+    "chat": {"type": "chat", "name": "Participant 17", "text": "Can everyone see my screen? " * 3},
+    "presence": {"type": "presence", "clientId": "k3j9x0q2m1", "name": "Participant 17"},
+    "candidate": {
+        "type": "candidate",
+        "from": "k3j9x0q2m1",
+        "to": "p0a8d7c6b5",
+        "candidate": {
+            "candidate": "candidate:842163049 1 udp 1677729535 203.0.113.7 53412 typ srflx "
+                         "raddr 192.168.1.20 rport 53412 generation 0 ufrag Xb1q network-cost 999",
+            "sdpMid": "0",
+            "sdpMLineIndex": 0,
+            "usernameFragment": "Xb1q",
+        },
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Compare per-message CPU of per-recipient json.dumps against encode-once fan-out"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--room-size", type=int, default=100)
+        parser.add_argument("--messages", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        room_size = options["room_size"]
+        messages = options["messages"]
+        self.stdout.write(
+            f"codec={'orjson' if codec.orjson else 'json'} room_size={room_size} messages={messages}"
+        )
+
+        for kind, msg in SAMPLES.items():
+            raw = json.dumps(msg)
+
+            # before: decode with json, every recipient re-encodes the payload
+            start = time.perf_counter()
+            for _ in range(messages):
+                payload = json.loads(raw)
+                # one frame per recipient: building them is the cost measured
+                [json.dumps({"type": kind, **payload}) for _ in range(room_size)]
+            before = (time.perf_counter() - start) / messages
+
+            # after: decode once, encode once, recipients forward the text
+            start = time.perf_counter()
+            for _ in range(messages):
+                payload = codec.loads(raw)
+                text = codec.dumps({**payload, "type": kind})
+                [text for _ in range(room_size)]
+            after = (time.perf_counter() - start) / messages
+
+            self.stdout.write(
+                f"{kind:<10} before={before * 1e6:9.1f}us/msg  after={after * 1e6:7.1f}us/msg  "
+                f"speedup={before / after:6.1f}x"
+            )
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench_ws import percentile
+
+
+def summarize(latencies, elapsed):
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(ms),
+        "seconds": round(elapsed, 4),
+        "requests_per_sec": round(len(ms) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 3) if ms else None,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the join endpoints (start_instant_meeting, schedule_meeting, verify_meeting, "
+        "join_meeting, end) with C concurrent browsers and report requests/sec and latency "
+        "per endpoint. In-process through Django's async request handler against a throwaway "
+        "test database by default, once with the async views and once with their sync twins "
+        "(--mode), or against a running server with --url, whose MEETING_ASYNC_VIEWS decides. "
+        "Prints JSON with the commit, so runs before and after a change can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+        parser.add_argument("--concurrency", type=int, default=20, help="browsers sending at once")
+        parser.add_argument("--url", help="e.g. http://127.0.0.1:8000 to load a running server")
+        parser.add_argument(
+            "--mode", choices=("both", "async", "sync"), default="both",
+            help="in-process: which join views to load (default both)",
+        )
+        parser.add_argument("-o", "--output", help="also write the JSON result to this file")
+
+    def handle(self, *args, **options):
+        # the views log every request; keep the output to the JSON result
+        views_logger = logging.getLogger("meetings.views")
+        level = views_logger.level
+        views_logger.setLevel(logging.WARNING)
+        try:
+            if options["url"]:
+                result = {"server": asyncio.run(self.run_scenario(options, *self.remote_hooks(options["url"])))}
+            else:
+                modes = ("async", "sync") if options["mode"] == "both" else (options["mode"],)
+                result = self.run_local(options, modes)
+        finally:
+            views_logger.setLevel(level)
+
+        # requests/sec and p99 side by side, per endpoint
+        result["summary"] = {
+            endpoint: {
+                mode: {"requests_per_sec": runs[endpoint]["requests_per_sec"], "p99_ms": runs[endpoint]["p99_ms"]}
+                for mode, runs in result.items()
+            }
+            for endpoint in next(iter(result.values()))
+        }
+        result["config"] = {k: options[k] for k in ("requests", "concurrency", "url", "mode")}
+        result["commit"] = self.commit()
+        text = json.dumps(result, indent=2)
+        self.stdout.write(text)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(text + "\n")
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip() or None
+        except OSError:
+            return None
+
+    # --- in-process ---
+
+    def run_local(self, options, modes):
+        from django.test.utils import override_settings, setup_databases, teardown_databases
+
+        overrides = override_settings(
+            SESSION_ENGINE="django.contrib.sessions.backends.db",
+            CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory"},
+        )
+        overrides.enable()
+        dbs = setup_databases(verbosity=0, interactive=False)
+        try:
+            from meetings import history
+
+            history._history = None
+            results = {}
+            for mode in modes:
+                with override_settings(MEETING_ASYNC_VIEWS=mode == "async"):
+                    self.reload_urls()
+                    results[mode] = asyncio.run(self.run_scenario(options, *self.local_hooks()))
+            return results
+        finally:
+            self.reload_urls()
+            teardown_databases(dbs, verbosity=0)
+            overrides.disable()
+
+    def reload_urls(self):
+        # meetings.urls picks the join views when imported; the root URLconf
+        # too, or its include() keeps the patterns it already resolved
+        import importlib
+
+        from django.urls import clear_url_caches
+
+        from meetings import urls
+
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def local_hooks(self):
+        from django.test import AsyncClient
+
+        async def browser():
+            return AsyncClient()
+
+        async def request(client, path, payload=None):
+            if payload is None:
+                response = await client.get(path)
+            else:
+                response = await client.post(path, json.dumps(payload), content_type="application/json")
+            return response.json()
+
+        return browser, request
+
+    # --- against a running server ---
+
+    def remote_hooks(self, url):
+        import http.cookiejar
+        import urllib.request
+
+        base = url.rstrip("/")
+
+        def open_browser():
+            # GET / for the CSRF cookie, like a browser landing on the home page
+            jar = http.cookiejar.CookieJar()
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+            opener.open(base + "/").read()
+            return opener, next((c.value for c in jar if c.name == "csrftoken"), "")
+
+        def send(client, path, payload):
+            opener, csrf = client
+            data = None if payload is None else json.dumps(payload).encode()
+            req = urllib.request.Request(
+                base + path, data=data,
+                headers={"Content-Type": "application/json", "X-CSRFToken": csrf, "Referer": base + "/"},
+            )
+            with opener.open(req) as resp:
+                return json.loads(resp.read())
+
+        async def browser():
+            return await asyncio.to_thread(open_browser)
+
+        async def request(client, path, payload=None):
+            return await asyncio.to_thread(send, client, path, payload)
+
+        return browser, request
+
+    # --- scenario ---
+
+    async def run_scenario(self, options, browser, request):
+        browsers = [await browser() for _ in range(options["concurrency"])]
+        count = options["requests"]
+        meetings = []
+
+        async def call(client, path, payload=None):
+            data = await request(client, path, payload)
+            if not data.get("success"):
+                raise CommandError(f"{path} failed: {data}")
+            return data
+
+        async def start(client, i):
+            data = await call(client, "/start_instant_meeting/", {"name": f"Host {i}", "designation": "Bench"})
+            # the starting browser is the host, the only one allowed to end it
+            meetings.append((data["meeting_code"], data["password"], client))
+
+        async def schedule(client, i):
+            await call(client, "/schedule_meeting/", {"name": f"Host {i}", "designation": "Bench"})
+
+        async def verify(client, i):
+            code, password, _ = meetings[i % len(meetings)]
+            await call(client, "/verify_meeting/", {"meeting_code": code, "password": password})
+
+        async def join(client, i):
+            code, _, _ = meetings[i % len(meetings)]
+            await call(client, "/join_meeting/", {"meeting_code": code, "name": f"Guest {i}", "designation": "Bench"})
+
+        async def end(client, i):
+            code, _, host = meetings[i]
+            await call(host, f"/end/{code}/", {})
+
+        results = {"start_instant_meeting": await self.load(browsers, count, start)}
+        results["schedule_meeting"] = await self.load(browsers, count, schedule)
+        results["verify_meeting"] = await self.load(browsers, count, verify)
+        results["join_meeting"] = await self.load(browsers, count, join)
+        results["end_meeting"] = await self.load(browsers, len(meetings), end)
+        return results
+
+    async def load(self, browsers, count, call):
+        pending = iter(range(count))
+        latencies = []
+
+        async def worker(client):
+            for i in pending:
+                sent = time.perf_counter()
+                await call(client, i)
+                latencies.append(time.perf_counter() - sent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in browsers))
+        return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare join throughput across session backends: each join is a fresh "
+        "browser doing POST /join_meeting/ then GET of the meeting page, against "
+        "a throwaway test database. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--joins", type=int, default=500)
+        parser.add_argument("--profiles", nargs="+", choices=sorted(ENGINES), default=list(ENGINES))
+        parser.add_argument(
+            "--redis", help="Redis URL for the session cache; defaults to an in-process LocMemCache"
+        )
+
+    def handle(self, *args, **options):
+        if options["redis"]:
+            session_cache = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": options["redis"]}
+        else:
+            session_cache = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench-sessions"}
+
+        # the join views log every join; keep the output to the JSON result
+        views_logger = logging.getLogger("meetings.views")
+        level = views_logger.level
+        views_logger.setLevel(logging.WARNING)
+
+        dbs = setup_databases(verbosity=0, interactive=False)
+        try:
+            from meetings.models import Meeting
+
+            Meeting.objects.create(
+                host_name="Bench", host_designation="Bench", meeting_code="BENCHSES",
+                meeting_pwd="bench", started_on=timezone.now(),
+            )
+            results = {}
+            for profile in options["profiles"]:
+                with override_settings(
+                    SESSION_ENGINE=ENGINES[profile],
+                    SESSION_CACHE_ALIAS="sessions",
+                    CACHES={
+                        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                        "sessions": session_cache,
+                    },
+                ):
+                    results[profile] = self.run(options["joins"])
+        finally:
+            teardown_databases(dbs, verbosity=0)
+            views_logger.setLevel(level)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, joins):
+        client = Client()
+        payload = json.dumps({"meeting_code": "BENCHSES", "name": "Bench", "designation": "Bench"})
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(joins):
+                client.cookies.clear()
+                response = client.post("/join_meeting/", payload, content_type="application/json")
+                assert response.json()["success"], response.content
+                assert client.get("/meet_code/BENCHSES/").status_code == 200
+            elapsed = time.perf_counter() - started
+        session_queries = [q for q in queries.captured_queries if "django_session" in q["sql"]]
+        return {
+            "joins": joins,
+            "seconds": round(elapsed, 3),
+            "joins_per_sec": round(joins / elapsed, 1),
+            "queries_per_join": round(len(queries.captured_queries) / joins, 2),
+            "session_queries_per_join": round(len(session_queries) / joins, 2),
+        }
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from meetings import codec
+from meetings.management.commands.bench_codec import SAMPLES
+
+
+SDP = "\r\n".join(
+    ["v=0", "o=- 4611731400430051336 2 IN IP4 127.0.0.1", "s=-", "t=0 0", "a=group:BUNDLE 0 1",
+     "a=extmap-allow-mixed", "a=msid-semantic: WMS stream"]
+    + [
+        line
+        for mid, kind, codecs in (("0", "audio", (111, 63, 9, 0, 8, 13, 110, 126)),
+                                  ("1", "video", (96, 97, 98, 99, 100, 101, 102, 103, 104, 105)))
+        for line in [
+            f"m={kind} 9 UDP/TLS/RTP/SAVPF {' '.join(map(str, codecs))}",
+            "c=IN IP4 0.0.0.0", "a=rtcp:9 IN IP4 0.0.0.0",
+            "a=ice-ufrag:Xb1q", "a=ice-pwd:9jKqf1y2cWbYhJm3Q0rT5u8v", "a=ice-options:trickle",
+            "a=fingerprint:sha-256 7B:8B:F0:65:5F:78:E2:51:3B:AC:6F:F3:3F:46:1B:35:DC:B8:5F:64:1A:24:C2:43:F0:A1:58:D0:A1:2C:19:08",
+            "a=setup:actpass", f"a=mid:{mid}", "a=sendrecv", "a=msid:stream track", "a=rtcp-mux",
+        ]
+        + [f"a=rtpmap:{pt} codec{pt}/90000" for pt in codecs]
+        + [f"a=rtcp-fb:{pt} nack" for pt in codecs]
+        + [f"a=fmtp:{pt} level-asymmetry-allowed=1;packetization-mode=1" for pt in codecs]
+    ]
+) + "\r\n"
+
+WIRE_SAMPLES = {
+    **SAMPLES,
+    "offer": {"type": "offer", "from": "k3j9x0q2m1", "to": "p0a8d7c6b5", "sdp": {"type": "offer", "sdp": SDP}},
+    "answer": {"type": "answer", "from": "p0a8d7c6b5", "to": "k3j9x0q2m1", "sdp": {"type": "answer", "sdp": SDP}},
+}
+
+# frames the consumer forwards as received; the rest it decodes and re-encodes
+PASS_THROUGH = {"offer", "answer", "candidate"}
+
+
+def per_call(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the JSON text and MessagePack binary websocket encodings: payload size, "
+        "encode/decode CPU and the consumer's per-frame cost for each message type"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        if codec.msgpack is None:
+            raise CommandError("msgpack is not installed")
+        n = options["iterations"]
+        self.stdout.write(f"json={'orjson' if codec.orjson else 'json'} iterations={n}")
+        self.stdout.write(
+            f"{'type':<10} {'json B':>7} {'msgpack B':>9} {'size':>6}   "
+            f"{'json enc/dec us':>16} {'msgpack enc/dec us':>19}   {'server json us':>14} {'server bin us':>13}"
+        )
+        for kind, msg in WIRE_SAMPLES.items():
+            text = codec.dumps(msg)
+            data = codec.packb(msg)
+            text_size = len(text.encode())
+
+            json_enc = per_call(lambda: codec.dumps(msg), n)
+            json_dec = per_call(lambda: codec.loads(text), n)
+            bin_enc = per_call(lambda: codec.packb(msg), n)
+            bin_dec = per_call(lambda: codec.unpackb(data), n)
+
+            # what receive() does per frame: decode, then forward the raw
+            # frame (signaling) or encode the rebroadcast frame once
+            if kind in PASS_THROUGH:
+                server_json, server_bin = json_dec, bin_dec
+            else:
+                server_json, server_bin = json_dec + json_enc, bin_dec + bin_enc
+
+            self.stdout.write(
+                f"{kind:<10} {text_size:>7} {len(data):>9} {len(data) / text_size:>6.0%}   "
+                f"{json_enc:>7.2f}/{json_dec:<8.2f} {bin_enc:>9.2f}/{bin_dec:<9.2f}   "
+                f"{server_json:>14.2f} {server_bin:>13.2f}"
+            )
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(latencies, frames, elapsed):
+    ms = [v * 1000 for v in latencies]
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 4),
+        "frames_per_sec": round(frames / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 3) if ms else None,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else None,
+    }
+
+
+class Client:
+    """One simulated participant: a socket plus a reader collecting latencies."""
+
+    def __init__(self, room, client_id, sock):
+        self.room = room
+        self.client_id = client_id
+        self.sock = sock
+        self.latencies = {}
+        self.received = 0
+        self.last_received = 0.0
+        self.roster = asyncio.Event()
+        self.reader = None
+
+    async def send(self, msg):
+        await self.sock.send(json.dumps(msg))
+
+    async def read(self):
+        while True:
+            msg = json.loads(await self.sock.recv())
+            self.received += 1
+            if self.received % 16 == 0:
+                # acked like the browser does, so the server's send window applies
+                await self.send({"type": "ack", "received": self.received})
+            self.last_received = time.perf_counter()
+            t = msg.get("type")
+            if t == "participant_list":
+                self.roster.set()
+            if t == "candidate_batch":
+                for candidate in msg["candidates"]:
+                    self.latencies.setdefault("candidate", []).append(time.perf_counter() - candidate["sent"])
+                continue
+            sent = msg.get("sent")
+            if sent is None and t == "chat":
+                sent = float(msg.get("text") or 0)
+            if sent is None and t == "candidate":
+                sent = msg["candidate"].get("sent")
+            if sent:
+                self.latencies.setdefault(t, []).append(time.perf_counter() - sent)
+
+
+class CommunicatorSocket:
+    """websockets-like send/recv over channels' WebsocketCommunicator."""
+
+    def __init__(self, communicator):
+        self.communicator = communicator
+
+    async def send(self, text):
+        await self.communicator.send_to(text_data=text)
+
+    async def recv(self):
+        while True:
+            out = await self.communicator.receive_output(timeout=3600)
+            if out["type"] == "websocket.send":
+                return out["text"]
+            if out["type"] == "websocket.close":
+                raise ConnectionError("socket closed")
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark MeetingConsumer: N rooms x M participants doing presence, chat and "
+        "signaling bursts. In-process (in-memory channel layer) by default, or against "
+        "a running server with --url. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=4)
+        parser.add_argument("--participants", type=int, default=10, help="participants per room")
+        parser.add_argument("--chat", type=int, default=5, help="chat messages per participant")
+        parser.add_argument("--signals", type=int, default=20, help="candidate frames per participant")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--url", help="e.g. ws://127.0.0.1:8000 to load a running server")
+        parser.add_argument("-o", "--output", help="also write the JSON result to this file")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        if options["url"]:
+            result = asyncio.run(self.run_remote(options))
+        else:
+            result = self.run_local(options)
+
+        result["config"] = {k: options[k] for k in ("rooms", "participants", "chat", "signals", "url")}
+        result["commit"] = self.commit()
+        text = json.dumps(result, indent=2)
+        self.stdout.write(text)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(text + "\n")
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip() or None
+        except OSError:
+            return None
+
+    # --- in-process ---
+
+    def run_local(self, options):
+        from django.test.utils import override_settings, setup_databases, teardown_databases
+
+        overrides = override_settings(
+            CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+            PARTICIPANT_REGISTRY={"BACKEND": "meetings.registry.InMemoryParticipantRegistry"},
+            CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory"},
+        )
+        overrides.enable()
+        dbs = setup_databases(verbosity=0, interactive=False)
+        try:
+            from channels.layers import channel_layers
+            from meetings import history, registry
+
+            channel_layers.backends.clear()
+            registry._registry = None
+            history._history = None
+            return asyncio.run(self.run_scenario(options, self.local_connect(options)))
+        finally:
+            from meetings.attendance import attendance_log
+
+            # write buffered stays while the test database still exists
+            attendance_log.flush()
+            teardown_databases(dbs, verbosity=0)
+            overrides.disable()
+
+    def local_connect(self, options):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from django.utils import timezone
+        from meetings.models import Meeting
+        from meetings.routing import websocket_urlpatterns
+        from meetings.tokens import issue_join_token
+
+        app = URLRouter(websocket_urlpatterns)
+
+        async def create_room(index):
+            meeting = await Meeting.objects.acreate(
+                host_name="Bench", host_designation="Bench",
+                meeting_code=f"BENCH{index:04d}", meeting_pwd="bench", started_on=timezone.now(),
+            )
+            return meeting.meeting_code
+
+        async def connect(code, client_id):
+            token, _ = issue_join_token(code, client_id)
+            communicator = WebsocketCommunicator(app, f"/ws/meet/{code}/?token={token}")
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise CommandError(f"consumer refused connection to {code}")
+            return CommunicatorSocket(communicator), client_id
+
+        return create_room, connect
+
+    # --- against a running server ---
+
+    async def run_remote(self, options):
+        try:
+            import websockets
+        except ImportError:
+            raise CommandError("--url needs the 'websockets' package (pip install websockets)")
+        import http.cookiejar
+        import urllib.request
+
+        base = options["url"].rstrip("/")
+        http_base = base.replace("wss://", "https://").replace("ws://", "http://")
+
+        def post(path, payload):
+            # fresh browser-like session: GET / for the CSRF cookie, then POST
+            jar = http.cookiejar.CookieJar()
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+            opener.open(http_base + "/").read()
+            csrf = next((c.value for c in jar if c.name == "csrftoken"), "")
+            req = urllib.request.Request(
+                http_base + path, data=json.dumps(payload).encode(),
+                headers={"Content-Type": "application/json", "X-CSRFToken": csrf, "Referer": http_base + "/"},
+            )
+            with opener.open(req) as resp:
+                return jar, json.loads(resp.read())
+
+        async def create_room(index):
+            _, data = await asyncio.to_thread(
+                post, "/start_instant_meeting/", {"name": "Bench", "designation": "Bench"}
+            )
+            return data["meeting_code"]
+
+        async def connect(code, client_id):
+            _, data = await asyncio.to_thread(
+                post, "/join_meeting/", {"meeting_code": code, "name": client_id, "designation": "Bench"}
+            )
+            sock = await websockets.connect(f"{base}/ws/meet/{code}/?token={data['token']}", max_size=None)
+            # the server picks the client id the token is bound to
+            return sock, data["client_id"]
+
+        return await self.run_scenario(options, (create_room, connect))
+
+    # --- scenario ---
+
+    async def run_scenario(self, options, hooks):
+        create_room, connect = hooks
+        rooms = [await create_room(i) for i in range(options["rooms"])]
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        clients = []
+        for code in rooms:
+            for i in range(options["participants"]):
+                sock, client_id = await connect(code, f"{code}-{i}")
+                client = Client(code, client_id, sock)
+                client.reader = asyncio.create_task(client.read())
+                clients.append(client)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results = {
+            "connections": len(clients),
+            "memory_per_connection_kb": round((after - before) / max(len(clients), 1) / 1024, 2),
+        }
+
+        # presence: join latency is presence sent -> own participant_list
+        started = time.perf_counter()
+        join_latencies = []
+        for client in clients:
+            sent = time.perf_counter()
+            await client.send({"type": "presence", "clientId": client.client_id, "name": client.client_id})
+            await client.roster.wait()
+            join_latencies.append(time.perf_counter() - sent)
+        await self.settle(clients)
+        results["presence"] = summarize(
+            join_latencies, sum(c.received for c in clients), max(c.last_received for c in clients) - started
+        )
+
+        results["chat"] = await self.burst(clients, "chat", options["chat"], self.chat_frames)
+        results["signal"] = await self.burst(clients, "candidate", options["signals"], self.signal_frames)
+
+        for client in clients:
+            client.reader.cancel()
+            await client.sock.close()
+        return results
+
+    def chat_frames(self, client, peers):
+        return {"type": "chat", "name": client.client_id, "text": repr(time.perf_counter())}
+
+    def signal_frames(self, client, peers):
+        target = random.choice([p for p in peers if p is not client] or [client])
+        return {
+            "type": "candidate", "from": client.client_id, "to": target.client_id,
+            "candidate": {
+                "candidate": "candidate:1 1 udp 2122260223 10.0.0.2 54321 typ host", "sdpMid": "0",
+                "sent": time.perf_counter(),
+            },
+        }
+
+    async def burst(self, clients, kind, count, frame):
+        by_room = {}
+        for client in clients:
+            by_room.setdefault(client.room, []).append(client)
+            client.latencies.pop(kind, None)
+        received = sum(c.received for c in clients)
+
+        started = time.perf_counter()
+        for _ in range(count):
+            await asyncio.gather(*(c.send(frame(c, by_room[c.room])) for c in clients))
+        await self.settle(clients)
+        elapsed = max(c.last_received for c in clients) - started
+
+        latencies = [v for c in clients for v in c.latencies.get(kind, [])]
+        return summarize(latencies, sum(c.received for c in clients) - received, elapsed)
+
+    async def settle(self, clients, quiet=0.2):
+        # wait until no socket has received anything for `quiet` seconds
+        last = -1
+        while True:
+            total = sum(c.received for c in clients)
+            if total == last:
+                return
+            last = total
+            await asyncio.sleep(quiet)
@@ -1,24 +1,196 @@
 from django.core.management.base import BaseCommand
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import glob
+import json
 import os
+import shutil
+import signal
+import socket
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+class Worker:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.proc = None
+        self.started = 0.0
+        self.restarts = 0
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
 
 class Command(BaseCommand):
-    help = "Run Daphne ASGI server on 127.0.0.1:8001 for production"
+    help = "Run Daphne ASGI workers sharing one listening socket, with restarts and a stats endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("-b", "--bind", default="127.0.0.1")
+        parser.add_argument("-p", "--port", type=int, default=8000)
+        parser.add_argument("--backlog", type=int, default=2048)
+        parser.add_argument("--stats-port", type=int, default=8099, help="local stats endpoint, 0 to disable")
+        parser.add_argument("--drain-timeout", type=int, default=30, help="seconds to wait for workers on shutdown")
+        parser.add_argument("--application", default="connectly.asgi:application")
 
     def handle(self, *args, **options):
         os.environ.setdefault("DJANGO_SETTINGS_MODULE", "connectly.settings")
 
-        host = "127.0.0.1"
-        port = "8000"
+        self.options = options
+        self.stopping = False
+        self.stats_dir = tempfile.mkdtemp(prefix="connectly-workers-")
+        self.workers = [Worker(i) for i in range(options["workers"])]
 
-        self.stdout.write(self.style.SUCCESS(f"Starting Daphne on {host}:{port}"))
+        # one listening socket, inherited by every worker through --fd
+        self.sock = socket.socket(socket.AF_INET6 if ":" in options["bind"] else socket.AF_INET)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((options["bind"], options["port"]))
+        self.sock.listen(options["backlog"])
+        self.sock.set_inheritable(True)
+
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+
+        if options["stats_port"]:
+            self.serve_stats(options["stats_port"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Starting {len(self.workers)} Daphne workers on {options['bind']}:{options['port']}"
+        ))
+        for worker in self.workers:
+            self.spawn(worker)
 
         try:
-            subprocess.run([
-                "python", "-m", "daphne",
-                "-b", host,
-                "-p", port,
-                "connectly.asgi:application"
-            ])
-        except KeyboardInterrupt:
-            self.stdout.write(self.style.WARNING("Server stopped manually."))
+            self.supervise()
+        finally:
+            self.sock.close()
+            shutil.rmtree(self.stats_dir, ignore_errors=True)
+
+    def spawn(self, worker):
+        if worker.proc is not None:
+            try:
+                os.remove(os.path.join(self.stats_dir, f"{worker.proc.pid}.json"))
+            except OSError:
+                pass
+        env = dict(
+            os.environ,
+            CONNECTLY_WORKER_ID=str(worker.worker_id),
+            CONNECTLY_STATS_DIR=self.stats_dir,
+        )
+        fd = self.sock.fileno()
+        worker.proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "daphne",
+                "--fd", str(fd),
+                "--application-close-timeout", str(self.options["drain_timeout"]),
+                self.options["application"],
+            ],
+            pass_fds=(fd,),
+            env=env,
+        )
+        worker.started = time.monotonic()
+
+    def supervise(self):
+        while not self.stopping:
+            for worker in self.workers:
+                if self.stopping or worker.alive:
+                    continue
+                code = worker.proc.returncode
+                # back off a worker that keeps dying right after start
+                if time.monotonic() - worker.started < 1:
+                    time.sleep(min(2 ** worker.restarts, 30) / 10)
+                worker.restarts += 1
+                self.stdout.write(self.style.WARNING(
+                    f"worker {worker.worker_id} (pid {worker.proc.pid}) exited with {code}, restarting"
+                ))
+                self.spawn(worker)
+            time.sleep(0.5)
+        self.drain()
+
+    def shutdown(self, signum, frame):
+        if not self.stopping:
+            self.stdout.write(self.style.WARNING("Shutting down, draining workers..."))
+        self.stopping = True
+
+    def drain(self):
+        # stop accepting first: every worker holds the same listening socket,
+        # and shutting it down makes new connections fail in all of them
+        # while the accepted ones stay open (Linux)
+        try:
+            self.sock.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
+        # daphne's SIGTERM closes every open connection at once, so only send
+        # it when the sockets have gone or --drain-timeout has passed
+        deadline = time.monotonic() + self.options["drain_timeout"]
+        while time.monotonic() < deadline:
+            stats = self.stats()
+            if not any(w["alive"] and w["connections"] for w in stats["workers"]):
+                break
+            time.sleep(0.5)
+        for worker in self.workers:
+            if worker.alive:
+                worker.proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.options["drain_timeout"] + 5
+        for worker in self.workers:
+            try:
+                worker.proc.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                worker.proc.kill()
+                worker.proc.wait()
+        self.stdout.write(self.style.SUCCESS("All workers stopped."))
+
+    def stats(self):
+        reports = {}
+        for path in glob.glob(os.path.join(self.stats_dir, "*.json")):
+            try:
+                with open(path) as fh:
+                    report = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            reports[report["pid"]] = report
+
+        now = time.time()
+        workers = []
+        for worker in self.workers:
+            pid = worker.proc.pid if worker.proc else None
+            report = reports.get(pid, {})
+            workers.append({
+                "worker": worker.worker_id,
+                "pid": pid,
+                "alive": worker.alive,
+                "healthy": worker.alive and now - report.get("updated", 0) < 10,
+                "restarts": worker.restarts,
+                "connections": report.get("connections", 0),
+                "total_connections": report.get("total_connections", 0),
+            })
+        return {
+            "workers": workers,
+            "connections": sum(w["connections"] for w in workers),
+            "stopping": self.stopping,
+        }
+
+    def serve_stats(self, port):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stats = command.stats()
+                body = json.dumps(stats).encode()
+                # a draining launcher is out of rotation
+                healthy = not stats["stopping"] and all(w["healthy"] for w in stats["workers"])
+                self.send_response(200 if healthy else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, name="worker-stats-http", daemon=True).start()
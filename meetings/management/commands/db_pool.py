@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from meetings.db import pool_stats
+
+
+class Command(BaseCommand):
+    help = "Show database connection / pool usage for each configured alias"
+
+    def handle(self, *args, **options):
+        for alias in connections:
+            for key, value in pool_stats(alias).items():
+                self.stdout.write(f"{key}: {value}")
+            self.stdout.write("")
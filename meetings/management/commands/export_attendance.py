@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from meetings.exports import EXPORTS, FORMATS, export_rows, parse_day, render
+
+
+class Command(BaseCommand):
+    help = "Stream meetings or participant attendance as CSV/JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=sorted(EXPORTS), default="attendance")
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--start", help="first day, YYYY-MM-DD")
+        parser.add_argument("--end", help="last day, YYYY-MM-DD")
+        parser.add_argument("--meeting", action="append", default=[], help="meeting code (repeatable)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_day(options["start"])
+            end = parse_day(options["end"], end=True)
+        except ValueError as exc:
+            raise CommandError(f"dates must be YYYY-MM-DD: {exc}")
+
+        rows = export_rows(
+            options["kind"],
+            start=start,
+            end=end,
+            codes=options["meeting"],
+            chunk_size=options["chunk_size"],
+        )
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            for chunk in render(options["kind"], rows, options["format"]):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
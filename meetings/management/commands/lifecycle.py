@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from meetings.lifecycle import Lifecycle
+
+
+class Command(BaseCommand):
+    help = (
+        "End unstarted, stale and abandoned meetings and archive old participant rows, "
+        "every --interval seconds (or once with --once). Defaults come from MEETING_LIFECYCLE."
+    )
+
+    def add_arguments(self, parser):
+        conf = getattr(settings, "MEETING_LIFECYCLE", {})
+        parser.add_argument("--interval", type=int, default=conf.get("INTERVAL", 60))
+        parser.add_argument("--once", action="store_true", help="run a single sweep and exit")
+        parser.add_argument("--schedule-grace", type=int, default=conf.get("SCHEDULE_GRACE", 7200))
+        parser.add_argument("--max-duration", type=int, default=conf.get("MAX_DURATION", 86400))
+        parser.add_argument("--abandon-after", type=int, default=conf.get("ABANDON_AFTER", 600))
+        parser.add_argument("--archive-after-days", type=int, default=conf.get("ARCHIVE_AFTER_DAYS"))
+        parser.add_argument("--batch-size", type=int, default=conf.get("BATCH_SIZE", 500))
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        lifecycle = Lifecycle(
+            schedule_grace=options["schedule_grace"],
+            max_duration=options["max_duration"],
+            abandon_after=options["abandon_after"],
+            archive_after_days=options["archive_after_days"],
+            batch_size=options["batch_size"],
+        )
+        if not lifecycle.check_abandoned:
+            self.stderr.write(self.style.WARNING(
+                "PARTICIPANT_REGISTRY is per-process, so this command can't see who is in a "
+                "meeting; not ending abandoned meetings. Configure a shared registry (Redis)."
+            ))
+        while True:
+            result = await lifecycle.sweep()
+            if options["once"]:
+                self.stdout.write(json.dumps(result))
+                return
+            await asyncio.sleep(options["interval"])
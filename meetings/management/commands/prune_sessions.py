@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired rows from django_session in small batches, optionally "
+        "compacting the table afterwards and repeating every --every seconds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+        parser.add_argument("--every", type=int, default=0, help="run forever, once per N seconds")
+        parser.add_argument("--compact", action="store_true", help="VACUUM the table after deleting")
+
+    def handle(self, *args, **options):
+        if not settings.SESSION_ENGINE.endswith((".db", ".cached_db")):
+            self.stdout.write(f"{settings.SESSION_ENGINE} keeps no session rows, nothing to prune")
+            return
+
+        while True:
+            deleted = self.prune(options["batch_size"], options["pause"])
+            if options["compact"] and deleted:
+                self.compact()
+            self.stdout.write(f"deleted {deleted} expired sessions")
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
+
+    def prune(self, batch_size, pause):
+        # short DELETEs on the expire_date index instead of one long one
+        # that locks the table while joins are writing sessions
+        deleted = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=timezone.now())
+                .values_list("session_key", flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            time.sleep(pause)
+
+    def compact(self):
+        table = connection.ops.quote_name(Session._meta.db_table)
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                # SQLite can only vacuum the whole file
+                cursor.execute("VACUUM")
+            elif connection.vendor == "postgresql":
+                cursor.execute(f"VACUUM ANALYZE {table}")
+            elif connection.vendor == "mysql":
+                cursor.execute(f"OPTIMIZE TABLE {table}")
@@ -0,0 +1,120 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import REGISTRY, query_count
+from .profiling import StackSampler, dump_folded
+
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "View latency", ("view", "method", "status")
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "Database queries per request", ("view",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+
+
+class MetricsMiddleware:
+    """
+    Per-view latency and DB query count, plus the optional slow-request
+    profiler (METRICS["PROFILE_SLOW_MS"]). Works under WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        conf = getattr(settings, "METRICS", {})
+        self.slow_ms = conf.get("PROFILE_SLOW_MS")
+        self.profile_dir = conf.get("PROFILE_DIR", "profiles")
+        self.sampler = None
+        if self.slow_ms is not None:
+            self.sampler = StackSampler(conf.get("PROFILE_INTERVAL", 0.005))
+            # only hook process_view when profiling, so the async handler
+            # doesn't adapt a no-op hook on every request
+            self.process_view = self.atrace_view if self.is_async else self.trace_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self.start(request)
+        response = self.get_response(request)
+        self.finish(request, response, token)
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        response = await self.get_response(request)
+        self.finish(request, response, token)
+        return response
+
+    def start(self, request):
+        box = [0]
+        reset = query_count.set(box)
+        if self.sampler:
+            self.sampler.begin(id(request))
+        return reset, box, time.perf_counter()
+
+    def trace_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "__wrapped__", view_func)
+        code = getattr(view, "__code__", None)
+        if code is not None:
+            self.sampler.trace(id(request), code)
+
+    async def atrace_view(self, request, view_func, view_args, view_kwargs):
+        self.trace_view(request, view_func, view_args, view_kwargs)
+
+    def finish(self, request, response, token):
+        reset, box, started = token
+        elapsed = time.perf_counter() - started
+        query_count.reset(reset)
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(box[0], view=view)
+
+        if self.sampler:
+            stacks = self.sampler.finish(id(request))
+            if stacks and elapsed * 1000 >= self.slow_ms:
+                dump_folded(stacks, self.profile_dir, view.replace(":", "-"))
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware chain. WhiteNoise is
+    sync-only, and one sync-only middleware makes Django adapt the rest of
+    the chain, async views included, through the thread pool. Here only a
+    request for a static file goes to a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0003_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meeting_id', models.BigIntegerField(db_index=True)),
+                ('meeting_code', models.CharField(max_length=12)),
+                ('name', models.CharField(max_length=128)),
+                ('designation', models.CharField(max_length=128)),
+                ('joined_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['host_status', 'started_on'], name='meeting_status_started_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    # meetings from before session tracking: distinct joined names only
+    Participant = apps.get_model("meetings", "Participant")
+    MeetingRollup = apps.get_model("meetings", "MeetingRollup")
+    counts = (
+        Participant.objects.order_by().values("meeting_id")
+        .annotate(n=models.Count("name", distinct=True))
+        .values_list("meeting_id", "n")
+    )
+    MeetingRollup.objects.bulk_create(
+        (MeetingRollup(meeting_id=mid, unique_attendees=n) for mid, n in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0004_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeetingRollup',
+            fields=[
+                ('meeting', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='meetings.meeting')),
+                ('peak_concurrency', models.IntegerField(default=0)),
+                ('attendee_seconds', models.BigIntegerField(default=0)),
+                ('unique_attendees', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=128)),
+                ('joined_at', models.DateTimeField()),
+                ('left_at', models.DateTimeField()),
+                ('meeting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='meetings.meeting')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['meeting', 'name'], name='attendance_meeting_name_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
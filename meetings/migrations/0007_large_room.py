@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0006_chat_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='large_room',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
-from django.db import models
 
 class Meeting(models.Model):
     HOST_STATUS_CHOICES = [
@@ -16,6 +16,16 @@ class Meeting(models.Model):
     meeting_pwd = models.CharField(max_length=12)
     host_status = models.IntegerField(choices=HOST_STATUS_CHOICES, default=0)
     started_on = models.DateTimeField()
+    # webinar mode: only the host speaks; attendees get a head count, not the roster
+    large_room = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination on the admin dashboard
+            models.Index(fields=["-started_on", "-id"], name="meeting_started_id_idx"),
+            # lifecycle sweeps: not-started / running meetings by age
+            models.Index(fields=["host_status", "started_on"], name="meeting_status_started_idx"),
+        ]
 
     def __str__(self):
         return f"{self.meeting_code} - {self.host_name}"
@@ -25,7 +35,72 @@ class Participant(models.Model):
     meeting = models.ForeignKey(Meeting, on_delete=models.CASCADE, related_name="participants")
     name = models.CharField(max_length=128)
     designation = models.CharField(max_length=128)
-    joined_at = models.DateTimeField(auto_now_add=True)
+    # set by the caller so buffered (write-behind) joins keep their real time
+    joined_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["meeting", "joined_at"], name="participant_meeting_joined_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.meeting.meeting_code})"
+
+
+class AttendanceSession(models.Model):
+    """One socket's stay in a meeting, written when it leaves."""
+    meeting = models.ForeignKey(Meeting, on_delete=models.CASCADE, related_name="attendance")
+    client_id = models.CharField(max_length=64)
+    name = models.CharField(max_length=128)
+    joined_at = models.DateTimeField()
+    left_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["meeting", "name"], name="attendance_meeting_name_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.joined_at} - {self.left_at})"
+
+
+class MeetingRollup(models.Model):
+    """Attendance figures per meeting, kept up to date by meetings.attendance."""
+    meeting = models.OneToOneField(Meeting, on_delete=models.CASCADE, primary_key=True, related_name="rollup")
+    peak_concurrency = models.IntegerField(default=0)
+    attendee_seconds = models.BigIntegerField(default=0)
+    unique_attendees = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def attendee_minutes(self):
+        return self.attendee_seconds // 60
+
+
+class ChatMessage(models.Model):
+    """Chat and hand-raise events of an ended meeting (CHAT_HISTORY["ARCHIVE"])."""
+    meeting = models.ForeignKey(Meeting, on_delete=models.CASCADE, related_name="chat_messages")
+    kind = models.CharField(max_length=16)
+    name = models.CharField(max_length=128)
+    text = models.TextField(blank=True)
+    sent_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["meeting", "sent_at"], name="chat_meeting_sent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}: {self.text[:40]}"
+
+
+class ParticipantArchive(models.Model):
+    """Participant rows of long-ended meetings, moved out by the lifecycle command."""
+    meeting_id = models.BigIntegerField(db_index=True)
+    meeting_code = models.CharField(max_length=12)
+    name = models.CharField(max_length=128)
+    designation = models.CharField(max_length=128)
+    joined_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.meeting_code})"
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from collections import deque
+
+from .metrics import REGISTRY
+
+
+OUTBOX_FRAMES = REGISTRY.gauge("ws_outbox_frames", "Frames queued for slow sockets on this worker")
+OUTBOX_DROPPED = REGISTRY.counter(
+    "ws_outbox_dropped_total", "Outbound frames dropped, by type and reason", ("type", "reason")
+)
+OUTBOX_EVICTIONS = REGISTRY.counter("ws_outbox_evictions_total", "Sockets closed for staying behind")
+OUTBOX_STALLS = REGISTRY.counter("ws_outbox_stalls_total", "Times a socket's send window filled up")
+
+# send order: lower first
+CONTROL, SIGNAL, CHAT, HAND = range(4)
+PRIORITIES = {
+    "end_meeting": CONTROL,
+    "token": CONTROL,
+    "offer": CONTROL,
+    "answer": CONTROL,
+    "participant_list": CONTROL,
+    "roster_delta": CONTROL,
+    "roster_page": CONTROL,
+    "presence": CONTROL,
+    "leave": CONTROL,
+    "screenshare": CONTROL,
+    "candidate": SIGNAL,
+    "candidate_batch": SIGNAL,
+    "chat": CHAT,
+    "backfill": CHAT,
+    "roster_count": CHAT,
+    "hand": HAND,
+}
+# only the newest one matters; a new one replaces the queued one
+COALESCED = {"roster_count"}
+
+
+class Outbox:
+    """
+    Bounded, prioritised send queue for one socket.
+
+    Handlers only ``put()`` frames; ``run()`` sends them, control frames
+    (signaling, roster, end of meeting) before candidates, chat and hands.
+
+    Daphne writes a sent frame straight into the transport buffer, so
+    ``send()`` returning says nothing about the client. Instead the client
+    acks how many frames it has handled (``ack()``); once it does, at most
+    ``window`` unacked frames are in flight and the rest wait here. A client
+    that never acks is not flow-controlled.
+
+    When ``max_frames`` are queued the oldest hand raise goes first, then
+    candidates older than ``stale_after`` seconds, then chat, then the
+    remaining candidates; control frames are never dropped. ``put()``
+    returns False once the socket has been behind for ``evict_after``
+    seconds since its first drop, and the caller should close it.
+    """
+
+    def __init__(self, send, max_frames=256, stale_after=10, evict_after=15, window=64):
+        self.send = send
+        self.max_frames = max_frames
+        self.stale_after = stale_after
+        self.evict_after = evict_after
+        self.window = window
+        self.queues = [deque() for _ in range(HAND + 1)]
+        self.size = 0
+        self.sent = 0
+        self.acked = None
+        self.behind_since = None
+        self.evicted = False
+        self.ready = asyncio.Event()
+        self.open = asyncio.Event()
+        self.open.set()
+
+    def put(self, kind, data):
+        priority = PRIORITIES.get(kind, CHAT)
+        queue = self.queues[priority]
+        if kind in COALESCED:
+            for entry in [e for e in queue if e[0] == kind]:
+                queue.remove(entry)
+                self.size -= 1
+                OUTBOX_FRAMES.dec()
+
+        if self.size >= self.max_frames and not self.shed():
+            if priority != CONTROL:
+                OUTBOX_DROPPED.inc(type=kind, reason="full")
+                return self.keep()
+        queue.append((kind, data, time.monotonic()))
+        self.size += 1
+        OUTBOX_FRAMES.inc()
+        self.ready.set()
+        return self.keep()
+
+    def shed(self):
+        """Drop one frame to make room; False if only control frames are left."""
+        now = time.monotonic()
+        if self.behind_since is None:
+            self.behind_since = now
+        for priority, stale_only in ((HAND, False), (SIGNAL, True), (CHAT, False), (SIGNAL, False)):
+            queue = self.queues[priority]
+            if queue and (not stale_only or now - queue[0][2] > self.stale_after):
+                kind = queue.popleft()[0]
+                self.size -= 1
+                OUTBOX_FRAMES.dec()
+                OUTBOX_DROPPED.inc(type=kind, reason="stale" if stale_only else "shed")
+                return True
+        return False
+
+    def keep(self):
+        if self.evicted:
+            return True
+        if self.behind_since is not None and time.monotonic() - self.behind_since > self.evict_after:
+            self.evicted = True
+            OUTBOX_EVICTIONS.inc()
+            return False
+        return True
+
+    def take(self):
+        now = time.monotonic()
+        for queue in self.queues:
+            while queue:
+                kind, data, queued = queue.popleft()
+                self.size -= 1
+                OUTBOX_FRAMES.dec()
+                if PRIORITIES.get(kind) == SIGNAL and now - queued > self.stale_after:
+                    OUTBOX_DROPPED.inc(type=kind, reason="stale")
+                    continue
+                return data
+        return None
+
+    def ack(self, received):
+        """The client has handled ``received`` frames on this socket."""
+        if not isinstance(received, int) or isinstance(received, bool):
+            return
+        received = min(received, self.sent)
+        if self.acked is None or received > self.acked:
+            self.acked = received
+        if self.sent - self.acked < self.window:
+            self.open.set()
+
+    def in_flight(self):
+        return 0 if self.acked is None else self.sent - self.acked
+
+    async def run(self):
+        while True:
+            if self.in_flight() >= self.window:
+                OUTBOX_STALLS.inc()
+                self.open.clear()
+                await self.open.wait()
+                continue
+            data = self.take()
+            if data is None:
+                # caught up
+                self.behind_since = None
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            await self.send(**data)
+            self.sent += 1
+
+    def clear(self):
+        OUTBOX_FRAMES.dec(self.size)
+        for queue in self.queues:
+            queue.clear()
+        self.size = 0
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    """
+    Opt-in wall-clock sampler for slow requests.
+
+    While at least one request is being traced, a daemon thread samples the
+    stacks of every thread every ``interval`` seconds and keeps those that
+    run through the traced view's code (so a sync view executing in the
+    asgiref thread pool is caught too). ``finish`` returns the samples in
+    collapsed "frame;frame;frame count" form, ready for flamegraph.pl or
+    speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def begin(self, token):
+        with self.lock:
+            self.active[token] = [None, Counter()]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+                self.thread.start()
+
+    def trace(self, token, code):
+        with self.lock:
+            if token in self.active:
+                self.active[token][0] = code
+
+    def finish(self, token):
+        with self.lock:
+            _, stacks = self.active.pop(token, (None, Counter()))
+        return stacks
+
+    def run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    self.thread = None
+                    return
+                watched = [entry for entry in self.active.values() if entry[0] is not None]
+            if not watched:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                codes, names = set(), []
+                while frame is not None:
+                    code = frame.f_code
+                    codes.add(code)
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                for code, stacks in watched:
+                    if code in codes:
+                        stacks[";".join(reversed(names))] += 1
+
+
+def dump_folded(stacks, directory, label):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}.folded")
+    with open(path, "w") as fh:
+        for stack, count in stacks.most_common():
+            fh.write(f"{stack} {count}\n")
+    return path
@@ -0,0 +1,259 @@
+import json
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InMemoryParticipantRegistry:
+    """Per-process roster. Fine for tests and a single Daphne worker."""
+
+    # other processes (the lifecycle sweep) see an empty roster
+    shared = False
+
+    def __init__(self, ttl=60, log_size=100, **kwargs):
+        self.ttl = ttl
+        self.log_size = log_size
+        self.rooms = {}
+        self.peers = {}
+        self.versions = {}
+        self.logs = {}
+
+    def _record(self, room, op, info):
+        version = self.versions.get(room, 0) + 1
+        self.versions[room] = version
+        self.logs.setdefault(room, deque(maxlen=self.log_size)).append({**info, "v": version, "op": op})
+        return version
+
+    async def join(self, room, channel_name, client_id, name):
+        info = {"clientId": client_id, "name": name}
+        members = self.rooms.setdefault(room, {})
+        room_peers = self.peers.setdefault(room, {})
+        previous = room_peers.get(client_id) if client_id else None
+        # same client back on a new socket: swap channels, roster unchanged
+        rejoined = previous is not None and previous != channel_name and previous in members
+        if rejoined:
+            del members[previous]
+        members[channel_name] = (info, time.monotonic() + self.ttl)
+        if client_id:
+            room_peers[client_id] = channel_name
+        if rejoined:
+            return self.versions.get(room, 0), True
+        return self._record(room, "join", info), False
+
+    async def heartbeat(self, room, channel_name, ttl=None):
+        entry = self.rooms.get(room, {}).get(channel_name)
+        if entry:
+            self.rooms[room][channel_name] = (entry[0], time.monotonic() + (ttl or self.ttl))
+
+    async def leave(self, room, channel_name):
+        entry = self.rooms.get(room, {}).pop(channel_name, None)
+        if not entry:
+            return None, None
+        info = entry[0]
+        room_peers = self.peers.get(room, {})
+        if room_peers.get(info["clientId"]) == channel_name:
+            del room_peers[info["clientId"]]
+        version = self._record(room, "leave", info)
+        if not self.rooms[room]:
+            for rooms in (self.rooms, self.peers, self.versions, self.logs):
+                rooms.pop(room, None)
+        return info, version
+
+    async def participants(self, room):
+        now = time.monotonic()
+        members = self.rooms.get(room, {})
+        for channel_name in [c for c, (_, expires) in members.items() if expires < now]:
+            await self.leave(room, channel_name)
+        return [info for info, _ in self.rooms.get(room, {}).values()]
+
+    async def roster(self, room):
+        participants = await self.participants(room)
+        return self.versions.get(room, 0), participants
+
+    async def changes(self, room, since):
+        version = self.versions.get(room, 0)
+        return version, _since(self.logs.get(room, ()), since, version)
+
+    async def page(self, room, cursor=0, count=100):
+        """``count`` participants from ``cursor``, and the cursor for the rest (None at the end)."""
+        participants = await self.participants(room)
+        end = cursor + count
+        return participants[cursor:end], (end if end < len(participants) else None)
+
+    async def count(self, room):
+        return len(await self.participants(room))
+
+    async def lookup(self, room, client_id):
+        return self.peers.get(room, {}).get(client_id)
+
+
+class RedisParticipantRegistry:
+    """
+    Roster shared by every worker through Redis.
+
+    Each meeting uses five keys: a hash of channel_name -> participant, a
+    hash of clientId -> channel_name, a sorted set of heartbeat deadlines,
+    the roster version and a capped list of the last changes. Joins and
+    leaves run as Lua scripts so the roster, version and change log move
+    together. Entries whose deadline has passed (crashed worker, lost
+    socket) are pruned when the roster is read, and the keys expire with
+    the room.
+    """
+
+    shared = True
+
+    JOIN = """
+    local rejoined = 0
+    if ARGV[2] ~= '' then
+        local previous = redis.call('HGET', KEYS[2], ARGV[2])
+        if previous and previous ~= ARGV[1] and redis.call('HEXISTS', KEYS[1], previous) == 1 then
+            redis.call('HDEL', KEYS[1], previous)
+            redis.call('ZREM', KEYS[3], previous)
+            rejoined = 1
+        end
+        redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+    local version
+    if rejoined == 1 then
+        version = tonumber(redis.call('GET', KEYS[4]) or '0')
+    else
+        version = redis.call('INCR', KEYS[4])
+        local entry = cjson.decode(ARGV[3])
+        entry.v = version
+        entry.op = 'join'
+        redis.call('RPUSH', KEYS[5], cjson.encode(entry))
+        redis.call('LTRIM', KEYS[5], -tonumber(ARGV[6]), -1)
+    end
+    for i = 1, 5 do
+        redis.call('EXPIRE', KEYS[i], ARGV[5])
+    end
+    return {version, rejoined}
+    """
+
+    LEAVE = """
+    local raw = redis.call('HGET', KEYS[1], ARGV[1])
+    if not raw then
+        return false
+    end
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    local entry = cjson.decode(raw)
+    -- only drop the peer mapping if it still points at the leaving channel
+    if type(entry.clientId) == 'string' and redis.call('HGET', KEYS[2], entry.clientId) == ARGV[1] then
+        redis.call('HDEL', KEYS[2], entry.clientId)
+    end
+    local version = redis.call('INCR', KEYS[4])
+    entry.v = version
+    entry.op = 'leave'
+    redis.call('RPUSH', KEYS[5], cjson.encode(entry))
+    redis.call('LTRIM', KEYS[5], -tonumber(ARGV[2]), -1)
+    return {raw, version}
+    """
+
+    def __init__(self, hosts=None, ttl=60, log_size=100, prefix="connectly:roster", **kwargs):
+        self.hosts = hosts or ["redis://127.0.0.1:6379"]
+        self.ttl = ttl
+        self.log_size = log_size
+        self.prefix = prefix
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+
+            host = self.hosts[0]
+            if isinstance(host, (list, tuple)):
+                host = f"redis://{host[0]}:{host[1]}"
+            self._redis = aioredis.Redis.from_url(host, decode_responses=True)
+        return self._redis
+
+    def keys(self, room):
+        base = f"{self.prefix}:{room}"
+        return f"{base}:members", f"{base}:peers", f"{base}:beats", f"{base}:version", f"{base}:log"
+
+    async def join(self, room, channel_name, client_id, name):
+        info = {"clientId": client_id, "name": name}
+        version, rejoined = await self.redis.eval(
+            self.JOIN, 5, *self.keys(room),
+            channel_name, client_id or "", json.dumps(info), time.time() + self.ttl, self.ttl * 2, self.log_size,
+        )
+        return int(version), bool(rejoined)
+
+    async def heartbeat(self, room, channel_name, ttl=None):
+        keys = self.keys(room)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(keys[2], {channel_name: time.time() + (ttl or self.ttl)}, xx=True)
+            for key in keys:
+                pipe.expire(key, self.ttl * 2)
+            await pipe.execute()
+
+    async def leave(self, room, channel_name):
+        result = await self.redis.eval(self.LEAVE, 5, *self.keys(room), channel_name, self.log_size)
+        if not result:
+            return None, None
+        raw, version = result
+        return json.loads(raw), int(version)
+
+    async def prune(self, room):
+        for channel_name in await self.redis.zrangebyscore(self.keys(room)[2], "-inf", time.time()):
+            await self.leave(room, channel_name)
+
+    async def participants(self, room):
+        await self.prune(room)
+        return [json.loads(raw) for raw in await self.redis.hvals(self.keys(room)[0])]
+
+    async def roster(self, room):
+        await self.prune(room)
+        members, _, _, version, _ = self.keys(room)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(version)
+            pipe.hvals(members)
+            current, raws = await pipe.execute()
+        return int(current or 0), [json.loads(raw) for raw in raws]
+
+    async def changes(self, room, since):
+        _, _, _, version, log = self.keys(room)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(version)
+            pipe.lrange(log, 0, -1)
+            current, raws = await pipe.execute()
+        current = int(current or 0)
+        return current, _since([json.loads(raw) for raw in raws], since, current)
+
+    async def page(self, room, cursor=0, count=100):
+        # HSCAN cursor; count is a hint, so a page can be a little longer
+        cursor, entries = await self.redis.hscan(self.keys(room)[0], cursor, count=count)
+        return [json.loads(raw) for raw in entries.values()], (int(cursor) or None)
+
+    async def count(self, room):
+        await self.prune(room)
+        return await self.redis.hlen(self.keys(room)[0])
+
+    async def lookup(self, room, client_id):
+        return await self.redis.hget(self.keys(room)[1], client_id)
+
+
+def _since(log, since, version):
+    """Changes after ``since``, or None if the log no longer reaches back that far."""
+    if since == version:
+        return []
+    if since > version or not log or log[0]["v"] > since + 1:
+        return None
+    return [entry for entry in log if entry["v"] > since]
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        conf = getattr(settings, "PARTICIPANT_REGISTRY", {})
+        backend = import_string(conf.get("BACKEND", "meetings.registry.InMemoryParticipantRegistry"))
+        _registry = backend(**conf.get("CONFIG", {}))
+    return _registry
@@ -0,0 +1,130 @@
+"""
+The join endpoints of views.py as plain sync views, the way they ran before
+they were made async. Served instead of those with MEETING_ASYNC_VIEWS off,
+so `manage.py bench_join` can compare the two paths; keep them in step.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .cache import check_password, meeting_cache
+from .codes import code_pool, generate_password
+from .history import archive_history
+from .models import Meeting
+from .tokens import HOST, issue_join_token
+from .views import host_fields, join_role, logger, schedule_time
+from .writebehind import participant_log
+
+
+def verify_meeting(request):
+    if request.method == "POST":
+        payload = json.loads(request.body.decode("utf-8"))
+        code = payload.get("meeting_code")
+        password = payload.get("password")
+        logger.debug("verify_meeting payload", extra={"event": "verify.request", "payload": payload})
+
+        meeting = meeting_cache.get(code) if code else None
+        if check_password(meeting, password):
+            logger.info("meeting verified", extra={"event": "verify.ok", "meeting_code": code})
+            return JsonResponse({"success": True, "meeting_code": meeting.meeting_code})
+        logger.info("meeting not found or invalid credentials", extra={"event": "verify.failed", "meeting_code": code})
+        return JsonResponse({"success": False, "error": "invalid_credentials"})
+    return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
+
+
+def join_meeting(request):
+    if request.method == "POST":
+        payload = json.loads(request.body.decode("utf-8"))
+        code = payload.get("meeting_code")
+        name = payload.get("name")
+        designation = payload.get("designation")
+        logger.debug("join_meeting payload", extra={"event": "join.request", "payload": payload})
+
+        if not (code and name and designation):
+            return JsonResponse({"success": False, "error": "missing_fields"})
+
+        meeting = meeting_cache.get(code)
+        if meeting is None:
+            logger.info("meeting not found", extra={"event": "join.not_found", "meeting_code": code})
+            return JsonResponse({"success": False, "error": "meeting_not_found"})
+
+        participant_log.add(meeting.id, name, designation)
+
+        access = request.session.get(f"meet_ok:{code}")
+        if not access:
+            access = request.session[f"meet_ok:{code}"] = True
+        token, client_id = issue_join_token(code, role=join_role(meeting, access))
+        logger.info("participant joined", extra={"event": "join.ok", "meeting_code": code})
+        return JsonResponse({"success": True, "token": token, "client_id": client_id})
+    return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
+
+
+def start_instant_meeting(request):
+    if request.method == "POST":
+        payload = json.loads(request.body.decode("utf-8"))
+        name, designation = host_fields(payload)
+        if not (name and designation):
+            return JsonResponse({"success": False, "error": "missing_fields"})
+
+        meeting = code_pool.create_meeting(
+            host_name=name,
+            host_designation=designation,
+            meeting_pwd=generate_password(),
+            started_on=timezone.now(),
+            large_room=bool(payload.get("large_room")),
+        )
+        code = meeting.meeting_code
+        participant_log.add(meeting.id, name, designation)
+
+        request.session[f"meet_ok:{code}"] = "host"
+        token, client_id = issue_join_token(code, role=HOST)
+        logger.info("instant meeting started", extra={"event": "instant.ok", "meeting_code": code})
+
+        return JsonResponse({
+            "success": True,
+            "meeting_code": meeting.meeting_code,
+            "password": meeting.meeting_pwd,
+            "token": token,
+            "client_id": client_id,
+        })
+    return JsonResponse({"success": False, "error": "invalid_request"}, status=400)
+
+
+def schedule_meeting(request):
+    if request.method == "POST":
+        payload = json.loads(request.body.decode("utf-8"))
+        name, designation = host_fields(payload)
+        if not (name and designation):
+            return JsonResponse({"success": False, "error": "missing_fields"})
+        try:
+            scheduled_time = schedule_time(payload)
+        except (TypeError, ValueError):
+            return JsonResponse({"success": False, "error": "invalid_time"})
+
+        meeting = code_pool.create_meeting(
+            host_name=name,
+            host_designation=designation,
+            meeting_pwd=generate_password(),
+            started_on=scheduled_time,
+            large_room=bool(payload.get("large_room")),
+        )
+        request.session[f"meet_ok:{meeting.meeting_code}"] = "host"
+
+        return JsonResponse({"success": True, "meeting_code": meeting.meeting_code, "password": meeting.meeting_pwd})
+    return JsonResponse({"success": False, "error": "invalid_request"}, status=400)
+
+
+def end_meeting(request, code):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
+    if request.session.get(f"meet_ok:{code}") != "host":
+        return JsonResponse({"success": False, "error": "not_host"}, status=403)
+    meeting = meeting_cache.get(code)
+    if meeting is None:
+        return JsonResponse({"success": False})
+    if Meeting.objects.filter(meeting_code=code, host_status__lt=2).update(host_status=2):
+        meeting_cache.invalidate(code)
+        async_to_sync(archive_history)(meeting.id, code)
+    return JsonResponse({"success": True})
@@ -1,3 +1,1207 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import codec, consumers, history, registry, sync_views
+from .cache import MeetingCache, check_password, meeting_cache
+from .attendance import AttendanceLog, attendance_log
+from .codes import CodePool
+from .exports import aexport_rows, export_rows
+from .lifecycle import Lifecycle
+from .metrics import Registry
+from .logs import RedactFilter, SampleFilter
+from .models import AttendanceSession, ChatMessage, Meeting, MeetingRollup, Participant
+from .outbox import Outbox
+from .routing import websocket_urlpatterns
+from .throttle import Throttle
+from .tokens import ATTENDEE, HOST, SPEAKER, issue_join_token, verify_join_token
+from .writebehind import ParticipantLog
+
+
+CODE = "TESTROOM"
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    PARTICIPANT_REGISTRY={"BACKEND": "meetings.registry.InMemoryParticipantRegistry"},
+    CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory"},
+    MEETING_THROTTLE={},
+)
+class ConsumerTestCase(TransactionTestCase):
+    """Meeting sockets over the in-memory channel layer and registry."""
+
+    def setUp(self):
+        channel_layers.backends.clear()
+        registry._registry = None
+        history._history = None
+        meeting_cache.clear()
+        Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+        self.app = URLRouter(websocket_urlpatterns)
+        # write the stays while the test database is still there
+        self.addCleanup(attendance_log.flush)
+
+    async def connect(self, binary=False, **token):
+        join, _ = issue_join_token(CODE, **token)
+        communicator = WebsocketCommunicator(
+            self.app, f"/ws/meet/{CODE}/?token={join}",
+            subprotocols=[codec.BINARY_SUBPROTOCOL] if binary else None,
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive(self, communicator):
+        out = await communicator.receive_output(1)
+        self.assertEqual(out["type"], "websocket.send")
+        if out.get("bytes") is not None:
+            return codec.unpackb(out["bytes"])
+        return codec.loads(out["text"])
+
+    async def frames(self, communicator, quiet=0.1):
+        """Every frame sent until the socket has been quiet for ``quiet`` seconds."""
+        frames = []
+        while not await communicator.receive_nothing(quiet):
+            frames.append(await self.receive(communicator))
+        return frames
+
+
+@unittest.skipIf(codec.msgpack is None, "msgpack is not installed")
+class CrossEncodingTests(ConsumerTestCase):
+
+    async def test_binary_chat_reaches_json_client(self):
+        sender, reader = await self.connect(binary=True), await self.connect()
+        await sender.send_to(bytes_data=codec.packb({"type": "chat", "name": "A", "text": "hi"}))
+        frame = await self.receive(reader)
+        self.assertEqual((frame["type"], frame["text"]), ("chat", "hi"))
+        await sender.disconnect()
+        await reader.disconnect()
+
+    async def test_json_chat_reaches_binary_client(self):
+        sender, reader = await self.connect(), await self.connect(binary=True)
+        await sender.send_to(text_data=codec.dumps({"type": "chat", "name": "A", "text": "hi"}))
+        out = await reader.receive_output(1)
+        self.assertIsNotNone(out.get("bytes"))
+        self.assertEqual(codec.unpackb(out["bytes"])["text"], "hi")
+        await sender.disconnect()
+        await reader.disconnect()
+
+    async def test_binary_only_values_are_rejected(self):
+        sender, reader = await self.connect(binary=True), await self.connect()
+        for frame in (
+            {"type": "chat", "name": "A", "text": b"raw"},
+            {"type": "hand", 1: "int key"},
+            {"type": "screenshare", "meta": {"nested": b"raw"}},
+        ):
+            await sender.send_to(bytes_data=codec.packb(frame))
+        self.assertTrue(await reader.receive_nothing(0.2))
+        self.assertEqual(await history.get_history().recent(CODE), [])
+
+        # both sockets are still alive
+        await sender.send_to(bytes_data=codec.packb({"type": "chat", "name": "A", "text": "ok"}))
+        self.assertEqual((await self.receive(reader))["text"], "ok")
+        await sender.disconnect()
+        await reader.disconnect()
+
+    async def test_unconvertible_group_event_is_dropped(self):
+        reader = await self.connect()
+        layer = channel_layers["default"]
+        await layer.group_send(f"meet_{CODE}", {
+            "type": "chat.broadcast", "bytes": codec.packb({"type": "chat", "text": b"raw"}),
+        })
+        await layer.group_send(f"meet_{CODE}", {
+            "type": "chat.broadcast", "text": codec.dumps({"type": "chat", "text": "after"}),
+        })
+        self.assertEqual((await self.receive(reader))["text"], "after")
+        await reader.disconnect()
+
+    async def test_undecodable_frames_are_ignored(self):
+        sender = await self.connect(binary=True)
+        await sender.send_to(bytes_data=b"\xc1")
+        await sender.send_to(text_data="{not json")
+        self.assertTrue(await sender.receive_nothing(0.1))
+        await sender.disconnect()
+
+
+class PresenceTests(ConsumerTestCase):
+
+    async def test_long_names_are_truncated(self):
+        communicator = await self.connect()
+        await communicator.send_to(text_data=codec.dumps({"type": "presence", "name": "x" * 500}))
+        await communicator.receive_output(1)
+        [info] = await registry.get_registry().participants(CODE)
+        self.assertEqual(info["name"], "x" * 128)
+        await communicator.disconnect()
+
+    @override_settings(MEETING_THROTTLE={"PRESENCE_DEDUP_SECONDS": 10})
+    async def test_presence_after_leave_joins_again(self):
+        communicator = await self.connect()
+        for kind in ("presence", "leave", "presence"):
+            await communicator.send_to(text_data=codec.dumps({"type": kind, "name": "A"}))
+            await self.frames(communicator)
+        self.assertEqual(len(await registry.get_registry().participants(CODE)), 1)
+
+        # a repeat within the window only refreshes the entry
+        await communicator.send_to(text_data=codec.dumps({"type": "presence", "name": "A"}))
+        self.assertEqual(await self.frames(communicator), [])
+        await communicator.disconnect()
+
+    @override_settings(MEETING_THROTTLE={"CANDIDATE_WINDOW": 0.05})
+    async def test_unhashable_fields_are_rejected(self):
+        sender, reader = await self.connect(), await self.connect()
+        for frame in (
+            {"type": ["presence"]},
+            {"type": "offer", "to": ["peer"]},
+            {"type": "candidate", "from": {"id": 1}, "to": "peer", "candidate": "c"},
+        ):
+            await sender.send_to(text_data=codec.dumps(frame))
+        self.assertEqual(await self.frames(reader), [])
+
+        # the sender's consumer is still running
+        await sender.send_to(text_data=codec.dumps({"type": "chat", "name": "A", "text": "ok"}))
+        self.assertEqual((await self.receive(reader))["text"], "ok")
+        await sender.disconnect()
+        await reader.disconnect()
+
+    @override_settings(MEETING_THROTTLE={"CANDIDATE_WINDOW": 0.05})
+    async def test_candidates_to_a_peer_are_coalesced(self):
+        sender, peer = await self.connect(client_id="alice"), await self.connect(client_id="bob")
+        await peer.send_to(text_data=codec.dumps({"type": "presence", "name": "B"}))
+        await self.frames(peer)
+        await self.frames(sender)
+
+        for n in range(3):
+            await sender.send_to(text_data=codec.dumps(
+                {"type": "candidate", "from": "alice", "to": "bob", "candidate": f"c{n}"}
+            ))
+        [frame] = await self.frames(peer)
+        self.assertEqual(frame["type"], "candidate_batch")
+        self.assertEqual(frame["candidates"], ["c0", "c1", "c2"])
+
+        await sender.send_to(text_data=codec.dumps(
+            {"type": "candidate", "from": "alice", "to": "bob", "candidate": "c3"}
+        ))
+        [frame] = await self.frames(peer)
+        self.assertEqual((frame["type"], frame["candidate"]), ("candidate", "c3"))
+        # sent to bob's channel only
+        self.assertEqual(await self.frames(sender), [])
+        await sender.disconnect()
+        await peer.disconnect()
+
+
+class SignalTests(ConsumerTestCase):
+
+    async def announce(self, *communicators):
+        for communicator in communicators:
+            await communicator.send_to(text_data=codec.dumps({"type": "presence", "name": "P"}))
+            await self.frames(communicator)
+        for communicator in communicators:
+            await self.frames(communicator)
+
+    def offer(self, to):
+        return codec.dumps({"type": "offer", "from": "alice", "to": to, "sdp": "v=0"})
+
+    async def test_signals_go_to_the_target_only(self):
+        alice, bob, carol = [await self.connect(client_id=c) for c in ("alice", "bob", "carol")]
+        await self.announce(alice, bob, carol)
+
+        await alice.send_to(text_data=self.offer("bob"))
+        self.assertEqual(await self.frames(bob), [codec.loads(self.offer("bob"))])
+        self.assertEqual(await self.frames(carol), [])
+        self.assertEqual(await self.frames(alice), [])
+        for communicator in (alice, bob, carol):
+            await communicator.disconnect()
+
+    async def test_unknown_targets_fall_back_to_the_room(self):
+        alice, bob = await self.connect(client_id="alice"), await self.connect(client_id="bob")
+        await self.announce(alice, bob)
+
+        # not announced yet, or announced on another worker's registry
+        await alice.send_to(text_data=self.offer("dave"))
+        self.assertEqual(await self.frames(bob), [codec.loads(self.offer("dave"))])
+        await alice.disconnect()
+        await bob.disconnect()
+
+    @override_settings(MEETING_LARGE_ROOM={"COUNT_INTERVAL": 60})
+    async def test_large_room_fallback_stays_on_stage(self):
+        await Meeting.objects.filter(meeting_code=CODE).aupdate(large_room=True)
+        alice, bob = await self.connect(client_id="alice"), await self.connect(client_id="bob")
+        attendee = await self.connect(client_id="att", role=ATTENDEE)
+        await self.announce(alice, bob, attendee)
+
+        # attendees are found in the audience roster
+        await alice.send_to(text_data=self.offer("att"))
+        self.assertEqual(await self.frames(attendee), [codec.loads(self.offer("att"))])
+        self.assertEqual(await self.frames(bob), [])
+
+        await alice.send_to(text_data=self.offer("dave"))
+        self.assertEqual(await self.frames(bob), [codec.loads(self.offer("dave"))])
+        self.assertEqual(await self.frames(attendee), [])
+        for communicator in (alice, bob, attendee):
+            await communicator.disconnect()
+
+
+class SocketTokenTests(ConsumerTestCase):
+
+    async def close_code(self, path):
+        communicator = WebsocketCommunicator(self.app, path)
+        await communicator.connect()
+        out = await communicator.receive_output(1)
+        await communicator.disconnect()
+        self.assertEqual(out["type"], "websocket.close")
+        return out["code"]
+
+    async def test_bad_tokens_are_refused(self):
+        other, _ = issue_join_token("OTHERROOM")
+        self.assertEqual(await self.close_code(f"/ws/meet/{CODE}/"), consumers.CLOSE_BAD_TOKEN)
+        self.assertEqual(await self.close_code(f"/ws/meet/{CODE}/?token={other}"), consumers.CLOSE_BAD_TOKEN)
+        with override_settings(MEETING_JOIN_TOKEN_MAX_AGE=-1):
+            token, _ = issue_join_token(CODE)
+            self.assertEqual(await self.close_code(f"/ws/meet/{CODE}/?token={token}"), consumers.CLOSE_BAD_TOKEN)
+        await (await self.connect()).disconnect()
+
+    async def test_ended_meetings_are_refused(self):
+        token, _ = issue_join_token(CODE)
+        await Meeting.objects.filter(meeting_code=CODE).aupdate(host_status=2)
+        self.assertEqual(await self.close_code(f"/ws/meet/{CODE}/?token={token}"), consumers.CLOSE_MEETING_GONE)
+        await Meeting.objects.filter(meeting_code=CODE).adelete()
+        meeting_cache.clear()
+        self.assertEqual(await self.close_code(f"/ws/meet/{CODE}/?token={token}"), consumers.CLOSE_MEETING_GONE)
+
+
+@override_settings(MEETING_RECONNECT_GRACE=0.2)
+class ReconnectTests(ConsumerTestCase):
+
+    async def join(self, client_id, since=None):
+        communicator = await self.connect(client_id=client_id)
+        await communicator.send_to(text_data=codec.dumps({"type": "presence", "name": client_id, "since": since}))
+        frames = await self.frames(communicator)
+        return communicator, [f for f in frames if f["type"] in ("participant_list", "roster_delta")][0]
+
+    async def test_reconnect_gets_a_delta(self):
+        alice, roster = await self.join("alice")
+        self.assertEqual(roster["type"], "participant_list")
+        await alice.disconnect()
+
+        bob, _ = await self.join("bob")
+        alice, roster = await self.join("alice", since=roster["version"])
+        self.assertEqual(roster["type"], "roster_delta")
+        self.assertEqual([(c["op"], c["clientId"]) for c in roster["changes"]], [("join", "bob")])
+
+        # too far back for the change log: the whole list
+        await alice.disconnect()
+        alice, roster = await self.join("alice", since=roster["version"] + 100)
+        self.assertEqual(roster["type"], "participant_list")
+        self.assertEqual(sorted(p["clientId"] for p in roster["participants"]), ["alice", "bob"])
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_back_within_the_grace_window(self):
+        alice, _ = await self.join("alice")
+        bob, _ = await self.join("bob")
+        await self.frames(alice)
+
+        await alice.disconnect()
+        alice, _ = await self.join("alice")
+        # bob saw neither a leave nor a join
+        await asyncio.sleep(0.3)
+        self.assertEqual(await self.frames(bob), [])
+        self.assertEqual(sorted(p["clientId"] for p in await registry.get_registry().participants(CODE)),
+                         ["alice", "bob"])
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_leave_after_the_grace_window(self):
+        alice, _ = await self.join("alice")
+        bob, _ = await self.join("bob")
+        await self.frames(alice)
+
+        await alice.disconnect()
+        self.assertEqual(await self.frames(bob, quiet=0.1), [])
+        [frame] = await self.frames(bob, quiet=0.3)
+        self.assertEqual((frame["type"], frame["clientId"]), ("leave", "alice"))
+        await bob.disconnect()
+
+
+class LargeRoomTests(ConsumerTestCase):
+
+    async def test_only_the_host_ends_the_meeting(self):
+        speaker = await self.connect()
+        await speaker.send_to(text_data=codec.dumps({"type": "end_meeting"}))
+        self.assertTrue(await speaker.receive_nothing(0.1))
+        self.assertEqual((await Meeting.objects.aget(meeting_code=CODE)).host_status, 0)
+
+        host = await self.connect(role=HOST)
+        await host.send_to(text_data=codec.dumps({"type": "end_meeting"}))
+        self.assertEqual((await self.receive(speaker))["type"], "end_meeting")
+        self.assertEqual((await Meeting.objects.aget(meeting_code=CODE)).host_status, 2)
+        await speaker.disconnect()
+        await host.disconnect()
+
+    async def test_audience_keeps_a_meeting_alive(self):
+        await Meeting.objects.filter(meeting_code=CODE).aupdate(host_status=1, large_room=True)
+        attendee = await self.connect(role=ATTENDEE)
+        await attendee.send_to(text_data=codec.dumps({"type": "presence", "name": "A"}))
+        await attendee.receive_output(1)
+
+        lifecycle = Lifecycle(abandon_after=0)
+        # the registry is in-process here, so the sweep can see it
+        lifecycle.check_abandoned = True
+        self.assertEqual(await lifecycle.end_abandoned(), 0)
+        self.assertFalse(await lifecycle.occupied("EMPTYROOM"))
+        await attendee.disconnect()
+
+    async def test_counts_survive_registry_errors(self):
+        calls = []
+
+        class Registry:
+            async def count(self, room):
+                calls.append(room)
+                if len(calls) <= 2:
+                    raise ConnectionError("registry down")
+                return 1
+
+        class Consumer:
+            frames = []
+
+            async def send_frame(self, frame):
+                self.frames.append(frame)
+
+        consumer = Consumer()
+        consumers.audiences[CODE] = {consumer}
+        self.addCleanup(consumers.audiences.pop, CODE, None)
+        with self.assertLogs("meetings.consumers", "ERROR"):
+            task = asyncio.create_task(consumers.send_counts(Registry(), CODE, 0.01))
+            await asyncio.sleep(0.1)
+            task.cancel()
+        self.assertEqual(consumer.frames[0], {"type": "roster_count", "speakers": 1, "attendees": 1})
+
+
+class LifecycleTests(ConsumerTestCase):
+
+    def running(self, count, age):
+        started = timezone.now() - timedelta(seconds=age)
+        Meeting.objects.filter(meeting_code=CODE).update(host_status=1, started_on=started)
+        Meeting.objects.bulk_create(
+            Meeting(host_name="Host", host_designation="Test", meeting_code=f"ROOM{i}",
+                    meeting_pwd="secret", started_on=started, host_status=1)
+            for i in range(count - 1)
+        )
+
+    def test_no_abandoned_check_with_a_per_process_registry(self):
+        self.running(1, age=3600)
+        lifecycle = Lifecycle(abandon_after=0)
+        self.assertFalse(lifecycle.check_abandoned)
+        self.assertEqual(asyncio.run(lifecycle.end_abandoned()), 0)
+        self.assertEqual(Meeting.objects.get(meeting_code=CODE).host_status, 1)
+
+    def test_abandoned_meetings_are_ended_page_by_page(self):
+        self.running(5, age=3600)
+        lifecycle = Lifecycle(abandon_after=0, batch_size=2)
+        lifecycle.check_abandoned = True
+        self.assertEqual(asyncio.run(lifecycle.end_abandoned()), 5)
+        self.assertFalse(Meeting.objects.filter(host_status=1).exists())
+
+    def test_recent_meetings_are_not_read(self):
+        self.running(3, age=60)
+        lifecycle = Lifecycle(abandon_after=600)
+        lifecycle.check_abandoned = True
+        self.assertEqual(asyncio.run(lifecycle.end_abandoned()), 0)
+        # not even tracked as empty yet
+        self.assertEqual(lifecycle.empty_since, {})
+
+
+class ChatHistoryTests(ConsumerTestCase):
+
+    async def chat(self, communicator, *texts):
+        for text in texts:
+            await communicator.send_to(text_data=codec.dumps({"type": "chat", "name": "A", "text": text}))
+        await communicator.send_to(text_data=codec.dumps({"type": "hand", "name": "A", "raised": True}))
+        await self.frames(communicator)
+
+    async def test_late_joiners_get_a_backfill(self):
+        sender = await self.connect()
+        await self.chat(sender, "one", "two")
+
+        late = await self.connect()
+        frame = await self.receive(late)
+        self.assertEqual(frame["type"], "backfill")
+        self.assertEqual(
+            [(m["type"], m.get("text")) for m in frame["messages"]],
+            [("chat", "one"), ("chat", "two"), ("hand", None)],
+        )
+        await sender.disconnect()
+        await late.disconnect()
+
+    async def test_buffer_keeps_the_newest(self):
+        buffer = history.InMemoryChatHistory(size=2, max_rooms=1)
+        for text in ("a", "b", "c"):
+            await buffer.append(CODE, text)
+        self.assertEqual(await buffer.recent(CODE), ["b", "c"])
+        await buffer.append("OTHERROOM", "x")
+        self.assertEqual(await buffer.recent(CODE), [])
+
+    @override_settings(CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory", "ARCHIVE": True})
+    async def test_ending_archives_the_buffer(self):
+        sender = await self.connect()
+        await self.chat(sender, "one")
+        host = await self.connect(role=HOST)
+        await host.send_to(text_data=codec.dumps({"type": "end_meeting"}))
+        self.assertEqual((await self.receive(sender))["type"], "end_meeting")
+        await self.frames(host)
+
+        rows = [(m.kind, m.name, m.text) async for m in ChatMessage.objects.order_by("sent_at", "id")]
+        self.assertEqual(rows, [("chat", "A", "one"), ("hand", "A", "")])
+        self.assertEqual(await history.get_history().recent(CODE), [])
+        await sender.disconnect()
+        await host.disconnect()
+
+    async def test_ending_without_archive_only_drops_the_buffer(self):
+        sender = await self.connect()
+        await self.chat(sender, "one")
+        host = await self.connect(role=HOST)
+        await host.send_to(text_data=codec.dumps({"type": "end_meeting"}))
+        await self.frames(host)
+        self.assertFalse(await ChatMessage.objects.aexists())
+        self.assertEqual(await history.get_history().recent(CODE), [])
+        await sender.disconnect()
+        await host.disconnect()
+
+
+class HeartbeatTests(ConsumerTestCase):
+
+    @override_settings(PARTICIPANT_REGISTRY={
+        "BACKEND": "meetings.registry.InMemoryParticipantRegistry", "CONFIG": {"ttl": 0.45},
+    })
+    async def test_one_token_refresh_per_tick(self):
+        registry._registry = None
+        communicator = await self.connect()
+        await communicator.send_to(text_data=codec.dumps({"type": "presence", "name": "A"}))
+        frames = []
+        # the first tick is ttl / 3 = 0.15s in, the second at 0.3s
+        deadline = time.monotonic() + 0.25
+        while not await communicator.receive_nothing(max(0, deadline - time.monotonic())):
+            frames.append(await self.receive(communicator))
+        self.assertEqual([f["type"] for f in frames].count("token"), 1)
+        await communicator.disconnect()
+
+
+class ChatLayerTests(ConsumerTestCase):
+
+    @override_settings(CHANNEL_LAYERS={
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+        "chat": {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"capacity": 5}},
+    })
+    async def test_chat_travels_on_its_own_layer(self):
+        channel_layers.backends.clear()
+        sender, reader = await self.connect(), await self.connect()
+        self.assertEqual(len(channel_layers["chat"].groups[f"meet_{CODE}_chat"]), 2)
+        await sender.send_to(text_data=codec.dumps({"type": "chat", "name": "A", "text": "hi"}))
+        self.assertEqual((await self.receive(reader))["text"], "hi")
+        await sender.disconnect()
+        await reader.disconnect()
+        self.assertNotIn(f"meet_{CODE}_chat", channel_layers["chat"].groups)
+
+    def test_group_send_overflow_is_counted(self):
+        key = consumers.LAYER_FULL.key({"op": "group_send"})
+        before = consumers.LAYER_FULL.values.get(key, 0)
+        with self.assertNoLogs("channels_redis.core"):
+            logging.getLogger("channels_redis.core").info(
+                "%s of %s channels over capacity in group %s", 3, 5, "meet_X"
+            )
+        self.assertEqual(consumers.LAYER_FULL.values[key], before + 3)
+
+
+class OutboxTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sent = []
+
+    async def send(self, text_data):
+        self.sent.append(text_data)
+
+    def outbox(self, **kwargs):
+        return Outbox(self.send, **kwargs)
+
+    def queued(self, outbox):
+        return [data["text_data"] for queue in outbox.queues for _, data, _ in queue]
+
+    async def drain(self, outbox):
+        task = asyncio.create_task(outbox.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    async def test_sends_by_priority(self):
+        outbox = self.outbox()
+        for kind in ("hand", "chat", "candidate", "offer", "end_meeting"):
+            outbox.put(kind, {"text_data": kind})
+        await self.drain(outbox)
+        self.assertEqual(self.sent, ["offer", "end_meeting", "candidate", "chat", "hand"])
+
+    def test_sheds_hand_then_stale_candidates_then_chat(self):
+        outbox = self.outbox(max_frames=3, stale_after=10)
+        outbox.put("chat", {"text_data": "chat"})
+        outbox.put("hand", {"text_data": "hand"})
+        outbox.put("candidate", {"text_data": "candidate"})
+        outbox.queues[1][0] = outbox.queues[1][0][:2] + (time.monotonic() - 60,)
+
+        outbox.put("offer", {"text_data": "offer1"})
+        self.assertEqual(self.queued(outbox), ["offer1", "candidate", "chat"])
+        outbox.put("offer", {"text_data": "offer2"})
+        self.assertEqual(self.queued(outbox), ["offer1", "offer2", "chat"])
+        outbox.put("offer", {"text_data": "offer3"})
+        self.assertEqual(self.queued(outbox), ["offer1", "offer2", "offer3"])
+
+    def test_fresh_candidates_outlive_chat(self):
+        outbox = self.outbox(max_frames=2)
+        outbox.put("candidate", {"text_data": "candidate"})
+        outbox.put("chat", {"text_data": "chat"})
+        outbox.put("answer", {"text_data": "answer"})
+        self.assertEqual(self.queued(outbox), ["answer", "candidate"])
+
+    def test_control_frames_are_never_dropped(self):
+        outbox = self.outbox(max_frames=1)
+        outbox.put("offer", {"text_data": "a"})
+        outbox.put("end_meeting", {"text_data": "b"})
+        outbox.put("chat", {"text_data": "c"})
+        self.assertEqual(self.queued(outbox), ["a", "b"])
+
+    def test_roster_counts_coalesce(self):
+        outbox = self.outbox()
+        outbox.put("roster_count", {"text_data": "1"})
+        outbox.put("roster_count", {"text_data": "2"})
+        self.assertEqual(self.queued(outbox), ["2"])
+        self.assertEqual(outbox.size, 1)
+
+    async def test_stale_candidates_are_skipped_on_send(self):
+        outbox = self.outbox(stale_after=10)
+        outbox.put("candidate", {"text_data": "old"})
+        outbox.queues[1][0] = outbox.queues[1][0][:2] + (time.monotonic() - 60,)
+        outbox.put("candidate", {"text_data": "new"})
+        await self.drain(outbox)
+        self.assertEqual(self.sent, ["new"])
+
+    def test_evicts_after_staying_behind(self):
+        outbox = self.outbox(max_frames=1, evict_after=10)
+        self.assertTrue(outbox.put("chat", {"text_data": "a"}))
+        self.assertTrue(outbox.put("chat", {"text_data": "b"}))
+        self.assertIsNotNone(outbox.behind_since)
+        outbox.behind_since -= 60
+        self.assertFalse(outbox.put("chat", {"text_data": "c"}))
+        # reported once
+        self.assertTrue(outbox.put("chat", {"text_data": "d"}))
+
+    async def test_catching_up_clears_behind(self):
+        outbox = self.outbox(max_frames=1)
+        outbox.put("chat", {"text_data": "a"})
+        outbox.put("chat", {"text_data": "b"})
+        await self.drain(outbox)
+        self.assertIsNone(outbox.behind_since)
+
+    async def test_window_holds_frames_until_acked(self):
+        outbox = self.outbox(window=2)
+        task = asyncio.create_task(outbox.run())
+        outbox.put("chat", {"text_data": "1"})
+        await asyncio.sleep(0.01)
+        outbox.ack(1)
+        for n in range(2, 6):
+            outbox.put("chat", {"text_data": str(n)})
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, ["1", "2", "3"])
+        self.assertEqual(outbox.size, 2)
+
+        outbox.ack(3)
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, ["1", "2", "3", "4", "5"])
+        task.cancel()
+
+    async def test_no_flow_control_without_acks(self):
+        outbox = self.outbox(window=2)
+        for n in range(5):
+            outbox.put("chat", {"text_data": str(n)})
+        await self.drain(outbox)
+        self.assertEqual(len(self.sent), 5)
+
+    def test_ack_ignores_bad_values(self):
+        outbox = self.outbox()
+        outbox.sent = 5
+        for value in ("3", None, True, 2.5):
+            outbox.ack(value)
+        self.assertIsNone(outbox.acked)
+        outbox.ack(99)
+        self.assertEqual(outbox.acked, 5)
+        outbox.ack(1)
+        self.assertEqual(outbox.acked, 5)
+
+
+class RegistryTests(SimpleTestCase):
+
+    def make_registry(self):
+        return registry.InMemoryParticipantRegistry()
+
+    def setUp(self):
+        self.registry = self.make_registry()
+
+    async def test_join_and_leave(self):
+        self.assertEqual(await self.registry.join(CODE, "ch1", "alice", "A"), (1, False))
+        self.assertEqual(await self.registry.join(CODE, "ch2", "bob", "B"), (2, False))
+        self.assertEqual(await self.registry.lookup(CODE, "bob"), "ch2")
+        self.assertEqual(await self.registry.count(CODE), 2)
+
+        info, version = await self.registry.leave(CODE, "ch2")
+        self.assertEqual((info, version), ({"clientId": "bob", "name": "B"}, 3))
+        self.assertIsNone(await self.registry.lookup(CODE, "bob"))
+        self.assertEqual(await self.registry.changes(CODE, 2), (3, [{**info, "v": 3, "op": "leave"}]))
+        self.assertEqual(await self.registry.leave(CODE, "ch2"), (None, None))
+
+    async def test_rejoin_swaps_the_channel(self):
+        await self.registry.join(CODE, "ch1", "alice", "A")
+        self.assertEqual(await self.registry.join(CODE, "ch1b", "alice", "A"), (1, True))
+        self.assertEqual(await self.registry.lookup(CODE, "alice"), "ch1b")
+        self.assertEqual(await self.registry.roster(CODE), (1, [{"clientId": "alice", "name": "A"}]))
+        # the old socket closing afterwards leaves the roster alone
+        self.assertEqual(await self.registry.leave(CODE, "ch1"), (None, None))
+        self.assertEqual(await self.registry.lookup(CODE, "alice"), "ch1b")
+
+    async def test_count_prunes_expired_members(self):
+        await self.registry.join(CODE, "ch1", "alice", "A")
+        await self.registry.join(CODE, "ch2", "bob", "B")
+        await self.registry.heartbeat(CODE, "ch1", ttl=-1)
+        self.assertEqual(await self.registry.count(CODE), 1)
+        self.assertEqual(await self.registry.participants(CODE), [{"clientId": "bob", "name": "B"}])
+
+
+class RedisRegistryTests(RegistryTests):
+    """The same against a local Redis, when there is one."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            import redis
+
+            redis.Redis(socket_connect_timeout=0.2).ping()
+        except Exception:
+            raise unittest.SkipTest("no Redis on localhost:6379")
+
+    def make_registry(self):
+        return registry.RedisParticipantRegistry(prefix=f"connectly:test:{os.getpid()}")
+
+    def tearDown(self):
+        import redis
+
+        client = redis.Redis()
+        for key in client.scan_iter(f"{self.registry.prefix}:*"):
+            client.delete(key)
+
+
+class ThrottleTests(SimpleTestCase):
+
+    def throttle(self, room=CODE, **limit):
+        self.addCleanup(Throttle.forget_room, room)
+        return Throttle(room, {"chat": {"rate": 0, "burst": 2, **limit}})
+
+    def test_connection_limit(self):
+        throttle = self.throttle()
+        self.assertEqual([throttle.check("chat") for _ in range(3)], [None, None, "connection"])
+        # types without limits always pass
+        self.assertIsNone(throttle.check("presence"))
+
+    def test_room_limit_is_shared(self):
+        first, second = self.throttle(room_rate=0, room_burst=3), self.throttle(room_rate=0, room_burst=3)
+        self.assertEqual([first.check("chat"), first.check("chat"), second.check("chat")], [None, None, None])
+        self.assertEqual(second.check("chat"), "room")
+        # another room has buckets of its own
+        self.assertIsNone(self.throttle("OTHERROOM", room_rate=0, room_burst=3).check("chat"))
+
+    def test_buckets_refill(self):
+        throttle = self.throttle(rate=10)
+        throttle.check("chat"), throttle.check("chat")
+        self.assertEqual(throttle.check("chat"), "connection")
+        throttle.buckets["chat"].updated -= 0.1
+        self.assertIsNone(throttle.check("chat"))
+
+
+class LogFilterTests(SimpleTestCase):
+
+    def record(self, msg, args=(), **extra):
+        record = logging.LogRecord("meetings", logging.INFO, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_redacts_extras_at_any_depth(self):
+        record = self.record("join", payload=[{"password": "hunter2", "name": "ok"}], auth=("token=abc",))
+        RedactFilter().filter(record)
+        self.assertEqual(record.payload, [{"password": "***", "name": "ok"}])
+        self.assertEqual(record.auth, ["token=***"])
+
+    def test_redacts_message_text(self):
+        for text in ("password=hunter2", "Password: hunter2", "password hunter2", '{"meeting_pwd": "hunter2"}'):
+            record = self.record("login %s", (text,))
+            RedactFilter().filter(record)
+            self.assertNotIn("hunter2", record.getMessage(), text)
+        record = self.record("joined %s", ("TESTROOM",))
+        RedactFilter().filter(record)
+        self.assertEqual(record.getMessage(), "joined TESTROOM")
+
+    def test_samples_by_event(self):
+        sample = SampleFilter({"join.request": 0.25})
+        with mock.patch("meetings.logs.random.random", side_effect=[0.1, 0.5]):
+            self.assertTrue(sample.filter(self.record("x", event="join.request")))
+            self.assertFalse(sample.filter(self.record("x", event="join.request")))
+        self.assertTrue(sample.filter(self.record("x", event="other")))
+        self.assertTrue(sample.filter(self.record("x")))
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="x", is_staff=True)
+        meeting = Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+        Participant.objects.bulk_create(
+            Participant(meeting=meeting, name=f"P{i}", designation="Test") for i in range(3)
+        )
+
+    async def test_streams_an_async_iterator(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get("/ad/export/attendance/?format=jsonl")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response]).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["P0", "P1", "P2"])
+
+    async def test_async_rows_span_chunks(self):
+        rows = [row async for row in aexport_rows("attendance", chunk_size=2)]
+        self.assertEqual([row[3] for row in rows], ["P0", "P1", "P2"])
+
+    def test_invalid_dates_are_rejected(self):
+        self.client.force_login(self.admin)
+        for query in ("start=2024-13-45", "end=2024-02-30", "start=yesterday"):
+            response = self.client.get(f"/ad/export/attendance/?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_command_rejects_invalid_dates(self):
+        with self.assertRaises(CommandError):
+            call_command("export_attendance", "--start", "2024-13-45")
+
+    def test_archived_participants_are_still_listed(self):
+        meeting = Meeting.objects.get(meeting_code=CODE)
+        Meeting.objects.filter(id=meeting.id).update(host_status=2)
+        self.assertEqual(Lifecycle(batch_size=2).archive(timezone.now() + timedelta(days=1)), 3)
+        # a late row written after the sweep stays in Participant
+        Participant.objects.create(meeting=meeting, name="P3", designation="Test")
+
+        rows = list(export_rows("attendance", codes=[CODE]))
+        self.assertEqual([row[3] for row in rows], ["P0", "P1", "P2", "P3"])
+        self.assertEqual({row[:3] for row in rows}, {(CODE, "Host", meeting.started_on)})
+
+        self.client.force_login(self.admin)
+        response = self.client.get(f"/ad/meeting/{meeting.id}/")
+        self.assertEqual([p.name for p in response.context["participants"]], ["P0", "P1", "P2", "P3"])
+
+
+class ParticipantLogTests(TransactionTestCase):
+
+    def setUp(self):
+        self.meeting = Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spill = os.path.join(tmp.name, "spill.jsonl")
+        self.log = ParticipantLog(write_behind=True, spill_path=self.spill)
+        self.log.start = lambda: None
+
+    def lines(self, path):
+        if not os.path.exists(path):
+            return []
+        with open(path) as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_bad_row_is_quarantined_not_replayed(self):
+        self.log.add(self.meeting.id, "A", "Test")
+        self.log.add(self.meeting.id + 1000, "Ghost", "Test")
+        self.log.add(self.meeting.id, "B", "Test")
+        with self.assertLogs("meetings.writebehind", "ERROR"):
+            self.log.flush()
+
+        self.assertEqual(sorted(Participant.objects.values_list("name", flat=True)), ["A", "B"])
+        self.assertEqual([row["name"] for row in self.lines(f"{self.spill}.rejected")], ["Ghost"])
+        self.assertEqual(self.lines(self.spill), [])
+        stats = self.log.stats()
+        self.assertEqual((stats["written"], stats["rejected"], stats["spilled"]), (2, 1, 0))
+
+        self.log.add(self.meeting.id, "C", "Test")
+        self.log.flush()
+        self.assertEqual(Participant.objects.count(), 3)
+
+    def test_rows_spill_while_the_database_is_down(self):
+        self.log.add(self.meeting.id, "A", "Test")
+        self.log.add(self.meeting.id, "B", "Test")
+        with mock.patch("meetings.writebehind.Participant.objects.bulk_create", side_effect=OperationalError), \
+                mock.patch("meetings.writebehind.Participant.objects.create", side_effect=OperationalError):
+            self.log.flush()
+        self.assertEqual([row["name"] for row in self.lines(self.spill)], ["A", "B"])
+        self.assertEqual(self.log.stats()["rejected"], 0)
+
+        self.log.flush()
+        self.assertEqual(sorted(Participant.objects.values_list("name", flat=True)), ["A", "B"])
+        self.assertFalse(os.path.exists(self.spill))
+
+    def test_unreadable_spill_lines_are_set_aside(self):
+        with open(self.spill, "w") as fh:
+            fh.write("{broken\n")
+            fh.write(json.dumps({"meeting_id": self.meeting.id, "name": "A", "designation": "T",
+                                 "joined_at": timezone.now().isoformat()}) + "\n")
+        with self.assertLogs("meetings.writebehind", "WARNING"):
+            self.log.flush()
+        self.assertEqual(Participant.objects.get().name, "A")
+        with open(f"{self.spill}.rejected") as fh:
+            self.assertEqual(fh.read(), "{broken\n")
+
+
+class AttendanceLogTests(TransactionTestCase):
+
+    def setUp(self):
+        self.meeting = Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+        self.log = AttendanceLog()
+        self.log.start = lambda: None
+
+    def stay(self, name, meeting_id=None):
+        now = timezone.now()
+        self.log.left(meeting_id or self.meeting.id, "c", name, now - timedelta(seconds=60), now)
+
+    def test_bad_stay_is_dropped_and_the_rest_written(self):
+        self.stay("A")
+        self.stay("Ghost", meeting_id=self.meeting.id + 1000)
+        self.stay("B")
+        self.log.joined(self.meeting.id, 2)
+        with self.assertLogs("meetings.attendance", "ERROR"):
+            self.log.flush()
+
+        self.assertEqual(sorted(AttendanceSession.objects.values_list("name", flat=True)), ["A", "B"])
+        rollup = MeetingRollup.objects.get(meeting=self.meeting)
+        self.assertEqual((rollup.unique_attendees, rollup.peak_concurrency, rollup.attendee_seconds), (2, 2, 120))
+        self.assertEqual(self.log.stats(), {"depth": 0, "dropped": 0, "rejected": 1})
+
+    def test_stays_are_kept_while_the_database_is_down(self):
+        self.stay("A")
+        self.stay("B")
+        with mock.patch("meetings.attendance.AttendanceSession.objects.bulk_create", side_effect=OperationalError), \
+                self.assertLogs("meetings.attendance", "ERROR"):
+            self.log.flush()
+        self.assertEqual(self.log.stats()["depth"], 2)
+
+        self.log.flush()
+        self.assertEqual(AttendanceSession.objects.count(), 2)
+        self.assertEqual(MeetingRollup.objects.get(meeting=self.meeting).unique_attendees, 2)
+
+    def test_names_are_counted_once_across_flushes(self):
+        self.stay("A")
+        self.log.flush()
+        self.stay("A")
+        self.stay("B")
+        self.log.flush()
+        self.assertEqual(MeetingRollup.objects.get(meeting=self.meeting).unique_attendees, 2)
+
+
+class MeetingCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        meeting_cache.clear()
+        self.meeting = Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+
+    def test_concurrent_misses_load_once(self):
+        cache, loads = MeetingCache(), []
+        load = cache._load
+
+        def slow_load(code):
+            loads.append(code)
+            time.sleep(0.05)
+            return load(code)
+
+        cache._load = slow_load
+        with ThreadPoolExecutor(8) as pool:
+            infos = list(pool.map(cache.get, [CODE] * 8))
+        self.assertEqual(loads, [CODE])
+        self.assertEqual({info.id for info in infos}, {self.meeting.id})
+
+    def test_shared_tier_holds_no_password(self):
+        cache = MeetingCache(shared_cache="default")
+        self.addCleanup(caches["default"].clear)
+        info = cache.get(CODE)
+        self.assertNotIn("secret", caches["default"].get(cache.key(CODE)))
+        self.assertTrue(check_password(info, "secret"))
+        self.assertFalse(check_password(info, "Secret"))
+        self.assertFalse(check_password(info, None))
+        self.assertFalse(check_password(None, "secret"))
+
+    def test_saving_a_meeting_invalidates(self):
+        self.assertEqual(meeting_cache.get(CODE).host_status, 0)
+        self.meeting.host_status = 2
+        self.meeting.save()
+        self.assertEqual(meeting_cache.get(CODE).host_status, 2)
+        self.meeting.delete()
+        self.assertIsNone(meeting_cache.get(CODE))
+
+    def test_invalidations_are_published(self):
+        published = []
+
+        class Redis:
+            def publish(self, channel, code):
+                published.append((channel, code))
+
+        cache = MeetingCache(redis_url="redis://unused")
+        # a stand-in client, and no listener thread
+        cache._redis, cache.listener = Redis(), False
+        cache.get(CODE)
+        cache.invalidate(CODE)
+        asyncio.run(cache.ainvalidate(CODE))
+        self.assertEqual(published, [(cache.channel, CODE)] * 2)
+        # what the listener does with another worker's message
+        cache.get(CODE)
+        cache._local_drop(CODE)
+        self.assertNotIn(CODE, cache.entries)
+
+
+class MetricsTests(TestCase):
+
+    def test_rendering(self):
+        metrics = Registry()
+        metrics.counter("hits_total", "Hits", ("path",)).inc(2, path='/a"b')
+        histogram = metrics.histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        metrics.add_collector(lambda: {"queue_depth": ("gauge", "Depth", 3)})
+        self.assertEqual(metrics.render().splitlines(), [
+            "# HELP hits_total Hits",
+            "# TYPE hits_total counter",
+            'hits_total{path="/a\\"b"} 2',
+            "# HELP wait_seconds Wait",
+            "# TYPE wait_seconds histogram",
+            'wait_seconds_bucket{le="0.1"} 1',
+            'wait_seconds_bucket{le="1.0"} 2',
+            'wait_seconds_bucket{le="+Inf"} 2',
+            "wait_seconds_sum 0.55",
+            "wait_seconds_count 2",
+            "# HELP queue_depth Depth",
+            "# TYPE queue_depth gauge",
+            "queue_depth 3",
+        ])
+
+    def test_staff_only(self):
+        # the test client's REMOTE_ADDR is 127.0.0.1, which used to be enough
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.client.force_login(User.objects.create_user("user", password="x"))
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.client.force_login(User.objects.create_user("admin", password="x", is_staff=True))
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE lifecycle_meetings_ended_total counter", response.content)
+
+    @override_settings(METRICS={"TOKEN": "scrape"})
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape").status_code, 200)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        with override_settings(METRICS={"TOKEN": None}):
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class CreateMeetingTests(TestCase):
+
+    def fields(self, **overrides):
+        return {"host_name": "Host", "host_designation": "Test", "meeting_pwd": "secret",
+                "started_on": timezone.now(), **overrides}
+
+    def test_retries_on_a_taken_code(self):
+        Meeting.objects.create(meeting_code="TAKEN", **self.fields())
+        pool = CodePool()
+        pool.codes.extend(["TAKEN", "FREE"])
+        self.assertEqual(pool.create_meeting(**self.fields()).meeting_code, "FREE")
+
+    def test_other_integrity_errors_are_not_retried(self):
+        pool = CodePool()
+        pool.codes.extend(["ONE", "TWO"])
+        with self.assertRaises(IntegrityError):
+            pool.create_meeting(**self.fields(host_name=None))
+        self.assertEqual(list(pool.codes), ["TWO"])
+
+    def test_views_require_host_fields(self):
+        for path in ("/start_instant_meeting/", "/schedule_meeting/"):
+            for payload in ({}, {"name": "Host"}, {"name": "  ", "designation": "Test"},
+                            {"name": "x" * 129, "designation": "Test"}, {"name": 1, "designation": "Test"}):
+                response = self.client.post(path, json.dumps(payload), content_type="application/json")
+                self.assertEqual(response.json()["error"], "missing_fields", (path, payload))
+        self.assertFalse(Meeting.objects.exists())
+
+    def test_schedule_rejects_a_bad_time(self):
+        response = self.client.post(
+            "/schedule_meeting/", json.dumps({"name": "Host", "designation": "Test", "time": "25:99"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["error"], "invalid_time")
+
+
+class DashboardTests(TestCase):
+
+    def test_bad_cursors_show_the_first_page(self):
+        self.client.force_login(User.objects.create_user("admin", password="x", is_staff=True))
+        for cursor in ("9" * 30 + ".1", "-" + "9" * 18 + ".1", "1." + "9" * 30, "nodot", "a.b"):
+            response = self.client.get("/ad/dashboard/", {"after": cursor})
+            self.assertEqual(response.status_code, 200, cursor)
+
+
+class JoinTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+
+    def setUp(self):
+        meeting_cache.clear()
+
+    def admit(self, access=True):
+        session = self.client.session
+        session[f"meet_ok:{CODE}"] = access
+        session.save()
+
+    def test_roles_and_codes(self):
+        token, cid = issue_join_token(CODE)
+        self.assertEqual(verify_join_token(token, CODE), (cid, SPEAKER))
+        token, cid = issue_join_token(CODE, "me", role=ATTENDEE)
+        self.assertEqual(verify_join_token(token, CODE), ("me", ATTENDEE))
+        self.assertIsNone(verify_join_token(token, "OTHERROOM"))
+        self.assertIsNone(verify_join_token(token + "x", CODE))
+        self.assertIsNone(verify_join_token(None, CODE))
+
+    @override_settings(MEETING_JOIN_TOKEN_MAX_AGE=-1)
+    def test_expired_tokens_only_identify_the_client(self):
+        token, cid = issue_join_token(CODE)
+        self.assertIsNone(verify_join_token(token, CODE))
+        self.assertEqual(verify_join_token(token, CODE, max_age=None), (cid, SPEAKER))
+
+    @override_settings(MEETING_JOIN_TOKEN_MAX_AGE=-1)
+    def test_refresh_keeps_the_client_id(self):
+        self.admit("host")
+        old, cid = issue_join_token(CODE, "abc")
+        data = self.client.get(f"/meet_code/{CODE}/token/", {"token": old}).json()
+        self.assertEqual((data["clientId"], data["role"]), ("abc", HOST))
+        with override_settings(MEETING_JOIN_TOKEN_MAX_AGE=60):
+            self.assertEqual(verify_join_token(data["token"], CODE), ("abc", HOST))
+
+    def test_refresh_ignores_other_rooms_tokens(self):
+        self.admit()
+        other, _ = issue_join_token("OTHERROOM", "abc")
+        data = self.client.get(f"/meet_code/{CODE}/token/", {"token": other}).json()
+        self.assertNotEqual(data["clientId"], "abc")
+        self.assertEqual(data["role"], SPEAKER)
+
+    def test_refresh_needs_access_and_a_live_meeting(self):
+        self.assertEqual(self.client.get(f"/meet_code/{CODE}/token/").status_code, 403)
+        self.admit()
+        Meeting.objects.filter(meeting_code=CODE).update(host_status=2)
+        self.assertEqual(self.client.get(f"/meet_code/{CODE}/token/").status_code, 404)
+
+
+@override_settings(CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory"})
+class SyncViewTests(TestCase):
+    """The sync twins of the join endpoints (MEETING_ASYNC_VIEWS off) still work end to end."""
+
+    def setUp(self):
+        history._history = None
+        meeting_cache.clear()
+
+    def call(self, view, payload, *args, session=None):
+        request = RequestFactory().post("/", json.dumps(payload), content_type="application/json")
+        request.session = session or SessionStore()
+        response = view(request, *args)
+        return response.status_code, json.loads(response.content)
+
+    def test_start_verify_join_end(self):
+        host = SessionStore()
+        _, started = self.call(sync_views.start_instant_meeting, {"name": "Host", "designation": "Test"}, session=host)
+        code, password = started["meeting_code"], started["password"]
+        self.assertEqual(verify_join_token(started["token"], code)[1], HOST)
+
+        self.assertTrue(self.call(sync_views.verify_meeting, {"meeting_code": code, "password": password})[1]["success"])
+        self.assertFalse(self.call(sync_views.verify_meeting, {"meeting_code": code, "password": "x"})[1]["success"])
+        guest = SessionStore()
+        _, joined = self.call(
+            sync_views.join_meeting, {"meeting_code": code, "name": "Guest", "designation": "Test"}, session=guest
+        )
+        self.assertEqual(verify_join_token(joined["token"], code)[1], SPEAKER)
+
+        self.assertEqual(self.call(sync_views.end_meeting, {}, code, session=guest)[0], 403)
+        self.assertEqual(self.call(sync_views.end_meeting, {}, code, session=host), (200, {"success": True}))
+        self.assertEqual(Meeting.objects.get(meeting_code=code).host_status, 2)
+
+    def test_schedule(self):
+        _, data = self.call(sync_views.schedule_meeting, {"name": "Host", "designation": "Test", "time": "25:99"})
+        self.assertEqual(data["error"], "invalid_time")
+        _, data = self.call(sync_views.schedule_meeting, {"name": "Host", "designation": "Test", "time": "09:30"})
+        self.assertEqual(timezone.localtime(Meeting.objects.get(meeting_code=data["meeting_code"]).started_on).hour, 9)
+
+
+@override_settings(CHAT_HISTORY={"BACKEND": "meetings.history.InMemoryChatHistory"})
+class EndMeetingViewTests(TestCase):
+
+    def setUp(self):
+        history._history = None
+        meeting_cache.clear()
+        Meeting.objects.create(
+            host_name="Host", host_designation="Test", meeting_code=CODE,
+            meeting_pwd="secret", started_on=timezone.now(),
+        )
+
+    def admit(self, access):
+        session = self.client.session
+        session[f"meet_ok:{CODE}"] = access
+        session.save()
+
+    def status(self):
+        return Meeting.objects.get(meeting_code=CODE).host_status
+
+    def test_only_the_host_session_ends_a_meeting(self):
+        self.assertEqual(self.client.get(f"/end/{CODE}/").status_code, 405)
+        self.assertEqual(self.client.post(f"/end/{CODE}/").status_code, 403)
+        self.admit(True)
+        self.assertEqual(self.client.post(f"/end/{CODE}/").status_code, 403)
+        self.assertEqual(self.status(), 0)
+
+        self.admit("host")
+        self.assertTrue(self.client.post(f"/end/{CODE}/").json()["success"])
+        self.assertEqual(self.status(), 2)
@@ -0,0 +1,63 @@
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self, cost=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+class Throttle:
+    """
+    Token buckets per message type, for one connection and for its room.
+
+    ``limits`` maps a message type to {"rate", "burst"} for the connection
+    and optionally {"room_rate", "room_burst"} for the whole room. Room
+    buckets live in ``room_buckets``, shared by every consumer of the room in
+    this process, so with several workers the room limit applies per
+    worker. Types without an entry are not limited.
+    """
+
+    room_buckets = {}
+
+    def __init__(self, room, limits):
+        self.room = room
+        self.limits = limits
+        self.buckets = {}
+
+    def check(self, msg_type):
+        """Return None if allowed, else "connection" or "room"."""
+        limit = self.limits.get(msg_type)
+        if not limit:
+            return None
+
+        bucket = self.buckets.get(msg_type)
+        if bucket is None:
+            bucket = self.buckets[msg_type] = TokenBucket(limit["rate"], limit["burst"])
+        if not bucket.allow():
+            return "connection"
+
+        if "room_rate" in limit:
+            key = (self.room, msg_type)
+            room_bucket = self.room_buckets.get(key)
+            if room_bucket is None:
+                room_bucket = self.room_buckets[key] = TokenBucket(limit["room_rate"], limit["room_burst"])
+            if not room_bucket.allow():
+                return "room"
+        return None
+
+    @classmethod
+    def forget_room(cls, room):
+        for key in [k for k in cls.room_buckets if k[0] == room]:
+            del cls.room_buckets[key]
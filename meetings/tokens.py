@@ -0,0 +1,48 @@
+"""
+Signed join tokens for the meeting socket.
+
+The join views hand out a token binding a meeting code to a client id; the
+consumer checks the signature and age on connect, so the handshake needs
+no session or user lookup.
+"""
+import secrets
+
+from django.conf import settings
+from django.core import signing
+
+
+SALT = "meetings.join"
+_DEFAULT = object()
+
+
+HOST = "host"
+SPEAKER = "speaker"
+ATTENDEE = "attendee"
+
+
+def issue_join_token(code, client_id=None, role=SPEAKER):
+    client_id = client_id or secrets.token_urlsafe(8)
+    payload = {"code": code, "cid": client_id}
+    if role != SPEAKER:
+        payload["role"] = role
+    return signing.dumps(payload, salt=SALT, compress=False), client_id
+
+
+def verify_join_token(token, code, max_age=_DEFAULT):
+    """
+    Return ``(client_id, role)`` if the token is valid for ``code``, else None.
+
+    ``max_age=None`` accepts an expired token, to recognise a client asking
+    for a fresh one.
+    """
+    if not token:
+        return None
+    if max_age is _DEFAULT:
+        max_age = getattr(settings, "MEETING_JOIN_TOKEN_MAX_AGE", 60)
+    try:
+        data = signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    if data.get("code") != code:
+        return None
+    return data.get("cid"), data.get("role", SPEAKER)
@@ -1,23 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from meetings import views
+from meetings import sync_views, views
+
+# MEETING_ASYNC_VIEWS off serves the join endpoints from their sync twins
+join_views = views if getattr(settings, "MEETING_ASYNC_VIEWS", True) else sync_views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('meet_code/<str:code>/', views.meeting, name='meeting'),
+    path('meet_code/<str:code>/token/', views.join_token, name='join_token'),
 
     #? admin routes
     path('ad/login/', views.admin_login, name='admin_login'),
     path('ad/logout/', views.admin_logout, name='admin_logout'),
     path('ad/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('ad/meeting/<int:mid>/', views.admin_meeting_detail, name='admin_meeting_detail'),
+    path('ad/export/<str:kind>/', views.admin_export, name='admin_export'),
+    path('metrics/', views.metrics, name='metrics'),
 
 
 
 #! --- stand alones ---
-    path("verify_meeting/", views.verify_meeting, name="verify_meeting"),
-    path("join_meeting/", views.join_meeting, name="join_meeting"),
-    path("start_instant_meeting/", views.start_instant_meeting, name="start_instant_meeting"),
-    path("schedule_meeting/", views.schedule_meeting, name="schedule_meeting"),
-    path('end/<str:code>/', views.end_meeting, name='end_meeting'),
+    path("verify_meeting/", join_views.verify_meeting, name="verify_meeting"),
+    path("join_meeting/", join_views.join_meeting, name="join_meeting"),
+    path("start_instant_meeting/", join_views.start_instant_meeting, name="start_instant_meeting"),
+    path("schedule_meeting/", join_views.schedule_meeting, name="schedule_meeting"),
+    path('end/<str:code>/', join_views.end_meeting, name='end_meeting'),
 
 ]
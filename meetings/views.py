@@ -1,14 +1,30 @@
-import random
-import string
-from django.shortcuts import get_object_or_404, redirect, render
-from django.http import JsonResponse
+from django.shortcuts import redirect, render
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
 from .models import *
+from .cache import check_password, meeting_cache
+from .history import archive_history
+from .codes import code_pool, generate_password
+from .tokens import ATTENDEE, HOST, SPEAKER, issue_join_token, verify_join_token
+from .writebehind import participant_log
 
+import hmac
 import json
+import logging
+from itertools import chain
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from .db import approximate_count
+from .metrics import REGISTRY
+from .exports import EXPORTS, FORMATS, aexport_rows, arender, parse_day
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 def index(request):
@@ -16,12 +32,54 @@ def index(request):
 
 
 def meeting(request, code):
-    meeting_obj = get_object_or_404(Meeting, meeting_code=code)
+    meeting_obj = meeting_cache.get(code)
+    if meeting_obj is None:
+        raise Http404
 
-    if not request.session.get(f"meet_ok:{code}", False):
+    access = request.session.get(f"meet_ok:{code}", False)
+    if not access:
         return redirect("index")
 
-    return render(request, "meeting.html", {"meeting_data": meeting_obj})
+    role = join_role(meeting_obj, access)
+    token, client_id = issue_join_token(code, role=role)
+    # the cache only holds a hash of the password, which the page shows
+    password = Meeting.objects.filter(id=meeting_obj.id).values_list("meeting_pwd", flat=True).first()
+    return render(request, "meeting.html", {
+        "meeting_data": meeting_obj,
+        "meeting_pwd": password,
+        "join": {"token": token, "clientId": client_id, "role": role},
+    })
+
+
+async def join_token(request, code):
+    # the page's token is short-lived; the client asks for a fresh one before
+    # each (re)connect, authorised by the session that was let in
+    if request.method != "GET":
+        return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
+    access = await request.session.aget(f"meet_ok:{code}")
+    if not access:
+        return JsonResponse({"success": False, "error": "no_access"}, status=403)
+    meeting = await meeting_cache.aget(code)
+    if meeting is None or meeting.host_status == 2:
+        return JsonResponse({"success": False, "error": "meeting_not_found"}, status=404)
+
+    # the previous token, even expired, proves which client id is asking:
+    # keeping it across reconnects lets the grace period apply
+    previous = verify_join_token(request.GET.get("token"), code, max_age=None)
+    client_id = previous[0] if previous else None
+    role = join_role(meeting, access)
+    token, client_id = issue_join_token(code, client_id, role=role)
+    return JsonResponse({"success": True, "token": token, "clientId": client_id, "role": role})
+
+
+def join_role(meeting, access):
+    # the browser that created the meeting hosts it (and may end it);
+    # in a large room nobody else speaks
+    if access == "host":
+        return HOST
+    if meeting.large_room:
+        return ATTENDEE
+    return SPEAKER
 
 
 
@@ -48,152 +106,249 @@ def admin_logout(request):
 
 
 
+DASHBOARD_PAGE_SIZE = 25
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(meeting):
+    return f"{(meeting.started_on - _EPOCH) // timedelta(microseconds=1)}.{meeting.id}"
+
+
+def decode_cursor(value):
+    try:
+        micros, mid = value.split(".")
+        started, mid = _EPOCH + timedelta(microseconds=int(micros)), int(mid)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    # ids are 64-bit; a bigger one would overflow in the query instead
+    if not 0 <= mid < 2 ** 63:
+        return None
+    return started, mid
+
+
 @login_required(login_url="/ad/login/")
 def admin_dashboard(request):
-    meetings = Meeting.objects.all().order_by("-started_on")
-    paginator = Paginator(meetings, 25)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    return render(request, "admin_dashboard.html", {"page_obj": page_obj})
+    # keyset pagination on (started_on, id): no OFFSET scan, no COUNT(*);
+    # attendance figures come precomputed from MeetingRollup
+    meetings = Meeting.objects.annotate(
+        unique_attendees=Coalesce("rollup__unique_attendees", 0),
+        peak_concurrency=Coalesce("rollup__peak_concurrency", 0),
+    )
+
+    after = decode_cursor(request.GET.get("after"))
+    before = decode_cursor(request.GET.get("before"))
+    if before:
+        started, mid = before
+        meetings = meetings.filter(Q(started_on__gt=started) | Q(started_on=started, id__gt=mid))
+        rows = list(meetings.order_by("started_on", "id")[:DASHBOARD_PAGE_SIZE + 1])
+        has_previous, has_next = len(rows) > DASHBOARD_PAGE_SIZE, True
+        rows = rows[:DASHBOARD_PAGE_SIZE][::-1]
+    else:
+        if after:
+            started, mid = after
+            meetings = meetings.filter(Q(started_on__lt=started) | Q(started_on=started, id__lt=mid))
+        rows = list(meetings.order_by("-started_on", "-id")[:DASHBOARD_PAGE_SIZE + 1])
+        has_previous, has_next = bool(after), len(rows) > DASHBOARD_PAGE_SIZE
+        rows = rows[:DASHBOARD_PAGE_SIZE]
+
+    context = {
+        "meetings": rows,
+        "has_previous": has_previous and bool(rows),
+        "has_next": has_next and bool(rows),
+        "previous_cursor": encode_cursor(rows[0]) if rows else "",
+        "next_cursor": encode_cursor(rows[-1]) if rows else "",
+    }
+    if getattr(settings, "DASHBOARD_APPROX_TOTAL", True):
+        context["approx_total"] = approximate_count(Meeting)
+    return render(request, "admin_dashboard.html", context)
 
 
 @login_required(login_url="/ad/login/")
 def admin_meeting_detail(request, mid):
     meeting = Meeting.objects.get(id=mid)
-    participants = Participant.objects.filter(meeting=meeting).order_by("joined_at")
-    return render(request, "admin_meeting_detail.html", {"meeting": meeting, "participants": participants})
+    # the lifecycle command may have moved some or all of them to the archive
+    participants = sorted(
+        chain(
+            ParticipantArchive.objects.filter(meeting_id=meeting.id).order_by("id"),
+            Participant.objects.filter(meeting=meeting).order_by("id"),
+        ),
+        key=lambda p: p.joined_at,
+    )
+    rollup = MeetingRollup.objects.filter(meeting=meeting).first()
+    return render(request, "admin_meeting_detail.html", {
+        "meeting": meeting,
+        "participants": participants,
+        "rollup": rollup,
+    })
+
+
+@login_required(login_url="/ad/login/")
+def admin_export(request, kind):
+    # ?format=csv|jsonl&start=YYYY-MM-DD&end=YYYY-MM-DD&meeting=<code>&meeting=<code>
+    fmt = request.GET.get("format", "csv")
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404
+    try:
+        start = parse_day(request.GET.get("start"))
+        end = parse_day(request.GET.get("end"), end=True)
+    except ValueError:
+        return HttpResponseBadRequest("start and end must be YYYY-MM-DD dates")
+    # an async iterator: under ASGI a sync one is read into a list before
+    # the first byte is sent
+    rows = aexport_rows(kind, start=start, end=end, codes=request.GET.getlist("meeting"))
+    response = StreamingHttpResponse(arender(kind, rows, fmt), content_type=FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+    return response
 
 
 
 
 
+def metrics(request):
+    # REMOTE_ADDR is the proxy's behind one, so not an access check
+    token = getattr(settings, "METRICS", {}).get("TOKEN")
+    sent = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not (request.user.is_staff or (token and hmac.compare_digest(sent.encode(), token.encode()))):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4")
+
+
+
 #! --- stand alones ---
 
-def verify_meeting(request):
+# async: under Daphne these run on the event loop instead of each taking a
+# turn on the thread pool when everybody joins at once
+
+async def verify_meeting(request):
     if request.method == "POST":
-        print("[verify_meeting] called")
         payload = json.loads(request.body.decode("utf-8"))
-        print("[verify_meeting] payload:", payload)
         code = payload.get("meeting_code")
         password = payload.get("password")
-        print(f"[verify_meeting] checking meeting {code} with password {password}")
+        logger.debug("verify_meeting payload", extra={"event": "verify.request", "payload": payload})
 
-        try:
-            meeting = Meeting.objects.get(meeting_code=code, meeting_pwd=password)
-            print(f"[verify_meeting] success: meeting verified ({meeting})")
+        meeting = await meeting_cache.aget(code) if code else None
+        if check_password(meeting, password):
+            logger.info("meeting verified", extra={"event": "verify.ok", "meeting_code": code})
             return JsonResponse({"success": True, "meeting_code": meeting.meeting_code})
-        except Meeting.DoesNotExist:
-            print("[verify_meeting] error: meeting not found or invalid credentials")
-            return JsonResponse({"success": False, "error": "invalid_credentials"})
-    print("[verify_meeting] invalid method")
+        logger.info("meeting not found or invalid credentials", extra={"event": "verify.failed", "meeting_code": code})
+        return JsonResponse({"success": False, "error": "invalid_credentials"})
     return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
 
 
-def join_meeting(request):
+async def join_meeting(request):
     if request.method == "POST":
-        print("[join_meeting] called")
         payload = json.loads(request.body.decode("utf-8"))
-        print("[join_meeting] payload:", payload)
         code = payload.get("meeting_code")
         name = payload.get("name")
         designation = payload.get("designation")
-        print(f"[join_meeting] meeting={code}, name={name}, designation={designation}")
+        logger.debug("join_meeting payload", extra={"event": "join.request", "payload": payload})
 
         if not (code and name and designation):
             return JsonResponse({"success": False, "error": "missing_fields"})
 
-        try:
-            meeting = Meeting.objects.get(meeting_code=code)
-            print("[join_meeting] meeting found, creating participant entry")
-            Participant.objects.create(
-                meeting=meeting,
-                name=name,
-                designation=designation
-            )
-
-            request.session[f"meet_ok:{code}"] = True
-            request.session.modified = True
-            print("[join_meeting] participant added, session updated")
-            return JsonResponse({"success": True})
-        except Meeting.DoesNotExist:
-            print("[join_meeting] error: meeting not found")
+        meeting = await meeting_cache.aget(code)
+        if meeting is None:
+            logger.info("meeting not found", extra={"event": "join.not_found", "meeting_code": code})
             return JsonResponse({"success": False, "error": "meeting_not_found"})
+
+        await participant_log.aadd(meeting.id, name, designation)
+
+        # a rejoin from the same browser leaves the session untouched (no write)
+        access = await request.session.aget(f"meet_ok:{code}")
+        if not access:
+            access = True
+            await request.session.aset(f"meet_ok:{code}", access)
+        token, client_id = issue_join_token(code, role=join_role(meeting, access))
+        logger.info("participant joined", extra={"event": "join.ok", "meeting_code": code})
+        return JsonResponse({"success": True, "token": token, "client_id": client_id})
     return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
 
 
-def start_instant_meeting(request):
+def host_fields(payload):
+    # checked here, so create_meeting() only ever fails on the code
+    name, designation = payload.get("name"), payload.get("designation")
+    if not all(isinstance(v, str) and 0 < len(v.strip()) <= 128 for v in (name, designation)):
+        return None, None
+    return name.strip(), designation.strip()
+
+
+async def start_instant_meeting(request):
     if request.method == "POST":
         payload = json.loads(request.body.decode("utf-8"))
-        name = payload.get("name")
-        designation = payload.get("designation")
-
-        code = generate_code()
-        pwd = generate_password()
+        name, designation = host_fields(payload)
+        if not (name and designation):
+            return JsonResponse({"success": False, "error": "missing_fields"})
 
-        meeting = Meeting.objects.create(
+        meeting = await code_pool.acreate_meeting(
             host_name=name,
             host_designation=designation,
-            meeting_code=code,
-            meeting_pwd=pwd,
-            started_on=timezone.now()
-        )
-        print(f'[instant meeting] = {meeting}')
-        Participant.objects.create(
-            meeting=meeting,
-            name=name,
-            designation=designation
+            meeting_pwd=generate_password(),
+            started_on=timezone.now(),
+            large_room=bool(payload.get("large_room")),
         )
+        code = meeting.meeting_code
+        await participant_log.aadd(meeting.id, name, designation)
+
+        await request.session.aset(f"meet_ok:{code}", "host")
+        token, client_id = issue_join_token(code, role=HOST)
+        logger.info("instant meeting started", extra={"event": "instant.ok", "meeting_code": code})
+
+        return JsonResponse({
+            "success": True,
+            "meeting_code": meeting.meeting_code,
+            "password": meeting.meeting_pwd,
+            "token": token,
+            "client_id": client_id,
+        })
+    return JsonResponse({"success": False, "error": "invalid_request"}, status=400)
 
-        request.session[f"meet_ok:{code}"] = True
-        request.session.modified = True
-        print("[join_meeting] participant added, session updated")
 
-        return JsonResponse({"success": True, "meeting_code": meeting.meeting_code, "password": meeting.meeting_pwd})
-    return JsonResponse({"success": False, "error": "invalid_request"}, status=400)
+def schedule_time(payload):
+    # "HH:MM" today, or now; ValueError/TypeError for anything else
+    time_str = payload.get("time")
+    if not time_str:
+        return timezone.now()
+    at = timezone.datetime.strptime(time_str, "%H:%M").time()
+    return timezone.make_aware(timezone.datetime.combine(timezone.now().date(), at))
 
 
-def schedule_meeting(request):
+async def schedule_meeting(request):
     if request.method == "POST":
         payload = json.loads(request.body.decode("utf-8"))
-        name = payload.get("name")
-        designation = payload.get("designation")
-        time_str = payload.get("time")
-
-        code = generate_code()
-        pwd = generate_password()
-
-        if time_str:
-            # store with given scheduled time
-            scheduled_time = timezone.make_aware(
-                timezone.datetime.combine(timezone.now().date(), timezone.datetime.strptime(time_str, "%H:%M").time())
-            )
-        else:
-            scheduled_time = timezone.now()
+        name, designation = host_fields(payload)
+        if not (name and designation):
+            return JsonResponse({"success": False, "error": "missing_fields"})
+        try:
+            scheduled_time = schedule_time(payload)
+        except (TypeError, ValueError):
+            return JsonResponse({"success": False, "error": "invalid_time"})
 
-        meeting = Meeting.objects.create(
+        meeting = await code_pool.acreate_meeting(
             host_name=name,
             host_designation=designation,
-            meeting_code=code,
-            meeting_pwd=pwd,
-            started_on=scheduled_time
+            meeting_pwd=generate_password(),
+            started_on=scheduled_time,
+            large_room=bool(payload.get("large_room")),
         )
+        # the scheduling browser is the host's
+        await request.session.aset(f"meet_ok:{meeting.meeting_code}", "host")
 
         return JsonResponse({"success": True, "meeting_code": meeting.meeting_code, "password": meeting.meeting_pwd})
     return JsonResponse({"success": False, "error": "invalid_request"}, status=400)
 
 
-def end_meeting(request, code):
-    mt = Meeting.objects.filter(meeting_code=code).first()
-    if not mt:
+async def end_meeting(request, code):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "invalid_method"}, status=405)
+    # like end_meeting on the socket: only the host's browser may end it
+    if await request.session.aget(f"meet_ok:{code}") != "host":
+        return JsonResponse({"success": False, "error": "not_host"}, status=403)
+    meeting = await meeting_cache.aget(code)
+    if meeting is None:
         return JsonResponse({"success": False})
-    mt.host_status = 2
-    mt.save(update_fields=["host_status"])
+    # one conditional UPDATE; whoever ends the meeting archives its chat
+    if await Meeting.objects.filter(meeting_code=code, host_status__lt=2).aupdate(host_status=2):
+        await meeting_cache.ainvalidate(code)
+        await archive_history(meeting.id, code)
     return JsonResponse({"success": True})
 
-
-
-def generate_code(length=8):
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-
-def generate_password(length=6):
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
\ No newline at end of file
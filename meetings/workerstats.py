@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from django.core.signals import request_started
+
+
+class WorkerStats:
+    """
+    Live connection count for this process.
+
+    When the process was started by ``manage.py daphne`` (CONNECTLY_STATS_DIR
+    is set), the numbers are written to <dir>/<pid>.json every ``interval``
+    seconds; the launcher reads those files for its stats endpoint, treats a
+    stale file as an unhealthy worker and waits for the connection counts to
+    reach 0 when draining.
+
+    A thread writes the file from startup until the first request or socket
+    reaches the event loop; from then on a task on the loop writes it, so a
+    worker whose loop is blocked goes stale instead of reporting healthy.
+    """
+
+    def __init__(self, stats_dir=None, worker_id=None, interval=2.0):
+        self.stats_dir = stats_dir
+        self.worker_id = worker_id
+        self.interval = interval
+        self.connections = 0
+        self.total_connections = 0
+        self.started = time.time()
+        self.thread = None
+        self.task = None
+
+    def opened(self):
+        self.connections += 1
+        self.total_connections += 1
+        self.attach()
+
+    def closed(self):
+        self.connections -= 1
+
+    def snapshot(self):
+        return {
+            "pid": os.getpid(),
+            "worker": self.worker_id,
+            "connections": self.connections,
+            "total_connections": self.total_connections,
+            "uptime": round(time.time() - self.started, 1),
+            "updated": time.time(),
+        }
+
+    def write(self):
+        path = os.path.join(self.stats_dir, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+
+    def start(self):
+        if self.stats_dir and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="worker-stats", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while self.task is None:
+            self.write()
+            time.sleep(self.interval)
+
+    def attach(self):
+        """Move the reporting onto the running event loop; call from the loop."""
+        if self.stats_dir and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.report())
+
+    async def report(self):
+        while True:
+            self.write()
+            await asyncio.sleep(self.interval)
+
+
+worker_stats = WorkerStats(
+    stats_dir=os.environ.get("CONNECTLY_STATS_DIR"),
+    worker_id=os.environ.get("CONNECTLY_WORKER_ID"),
+)
+# report health from startup, not only after the first websocket
+worker_stats.start()
+
+
+async def attach_stats(sender, **kwargs):
+    # async receiver: runs on the event loop that serves the request
+    worker_stats.attach()
+
+
+request_started.connect(attach_stats, dispatch_uid="worker_stats")
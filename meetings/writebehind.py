@@ -0,0 +1,212 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import REGISTRY
+from .models import Participant
+
+
+logger = logging.getLogger(__name__)
+
+
+class ParticipantLog:
+    """
+    Records participant joins.
+
+    With write-behind off every join is a plain INSERT. With it on, rows are
+    buffered and a background thread writes them with bulk_create once
+    max_batch rows are queued or flush_interval seconds have passed. If the
+    database refuses a batch, its rows are retried one by one: rows the
+    database rejects (IntegrityError, DataError) are moved to
+    ``<spill_path>.rejected`` and logged, and if the database is unavailable
+    the remaining rows are appended to a local JSONL spill file, which is
+    replayed ahead of the next flush. The buffer is also flushed at
+    interpreter exit.
+    """
+
+    def __init__(self, write_behind=False, max_batch=200, flush_interval=1.0, spill_path=None):
+        self.write_behind = write_behind
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.counters = {
+            "queued": 0,
+            "written": 0,
+            "spilled": 0,
+            "rejected": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def add(self, meeting_id, name, designation):
+        if not self.write_behind:
+            Participant.objects.create(meeting_id=meeting_id, name=name, designation=designation)
+            return
+
+        row = {
+            "meeting_id": meeting_id,
+            "name": name,
+            "designation": designation,
+            "joined_at": timezone.now(),
+        }
+        with self.lock:
+            self.buffer.append(row)
+            self.counters["queued"] += 1
+            full = len(self.buffer) >= self.max_batch
+        self.start()
+        if full:
+            self.wakeup.set()
+
+    async def aadd(self, meeting_id, name, designation):
+        if not self.write_behind:
+            await Participant.objects.acreate(meeting_id=meeting_id, name=name, designation=designation)
+            return
+        self.add(meeting_id, name, designation)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="participant-log", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        with self.flush_lock:
+            rows = self.read_spill() + rows
+            if not rows:
+                return
+            started = time.perf_counter()
+            try:
+                Participant.objects.bulk_create(
+                    [Participant(**row) for row in rows], batch_size=self.max_batch
+                )
+                written = len(rows)
+            except DatabaseError:
+                self.count(flush_errors=1)
+                written = self.write_each(rows)
+            elapsed = (time.perf_counter() - started) * 1000
+            with self.lock:
+                self.counters["written"] += written
+                self.counters["flushes"] += 1
+                self.counters["last_flush_ms"] = elapsed
+                self.counters["max_flush_ms"] = max(self.counters["max_flush_ms"], elapsed)
+
+    def write_each(self, rows):
+        """Retry a refused batch row by row, so one bad row can't hold back the rest."""
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                Participant.objects.create(**row)
+                written += 1
+            except (IntegrityError, DataError):
+                logger.exception("participant row rejected", extra={"event": "participant_log.rejected"})
+                self.reject(row)
+            except DatabaseError:
+                # the database itself is failing; keep the rest for the next flush
+                self.spill(rows[i:])
+                break
+        return written
+
+    def dump(self, path, rows):
+        with open(path, "a", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write(json.dumps({**row, "joined_at": row["joined_at"].isoformat()}) + "\n")
+
+    def spill(self, rows):
+        if not self.spill_path:
+            return
+        self.dump(self.spill_path, rows)
+        self.count(spilled=len(rows))
+
+    def reject(self, row):
+        if self.spill_path:
+            self.dump(f"{self.spill_path}.rejected", [row])
+        self.count(rejected=1)
+
+    def count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def read_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        replay = f"{self.spill_path}.replay"
+        os.replace(self.spill_path, replay)
+        rows = []
+        with open(replay, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["joined_at"] = parse_datetime(row["joined_at"])
+                    if row["joined_at"] is None:
+                        raise ValueError("missing joined_at")
+                except (ValueError, TypeError, KeyError):
+                    logger.warning(
+                        "unreadable spilled participant row: %r", line,
+                        extra={"event": "participant_log.rejected"},
+                    )
+                    with open(f"{self.spill_path}.rejected", "a", encoding="utf-8") as out:
+                        out.write(line.rstrip("\n") + "\n")
+                    self.count(rejected=1)
+                    continue
+                rows.append(row)
+        os.remove(replay)
+        return rows
+
+    def stats(self):
+        with self.lock:
+            return {"depth": len(self.buffer), **self.counters}
+
+
+_conf = getattr(settings, "PARTICIPANT_LOG", {})
+participant_log = ParticipantLog(
+    write_behind=_conf.get("WRITE_BEHIND", False),
+    max_batch=_conf.get("MAX_BATCH", 200),
+    flush_interval=_conf.get("FLUSH_INTERVAL", 1.0),
+    spill_path=_conf.get("SPILL_PATH"),
+)
+
+
+def _collect():
+    stats = participant_log.stats()
+    return {
+        "participant_log_depth": ("gauge", "Joins buffered, not yet written", stats["depth"]),
+        "participant_log_written_total": ("counter", "Joins written by bulk_create", stats["written"]),
+        "participant_log_spilled_total": ("counter", "Joins spilled to the local file", stats["spilled"]),
+        "participant_log_rejected_total": ("counter", "Joins the database rejected, set aside", stats["rejected"]),
+        "participant_log_flush_errors_total": ("counter", "Failed flushes", stats["flush_errors"]),
+        "participant_log_last_flush_ms": ("gauge", "Duration of the last flush", stats["last_flush_ms"]),
+    }
+
+
+if participant_log.write_behind:
+    REGISTRY.add_collector(_collect)
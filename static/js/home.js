@@ -353,7 +353,8 @@ if (instantForm) {
         const hostName = document.getElementById("instantName").value;
         const payload = {
             name: hostName,
-            designation: document.getElementById("instantDesignation").value
+            designation: document.getElementById("instantDesignation").value,
+            large_room: document.getElementById("instantLargeRoom").checked
         };
 
         fetch("/start_instant_meeting/", {
@@ -400,7 +401,8 @@ if (scheduleForm) {
         const payload = {
             name: document.getElementById("scheduleName").value,
             designation: document.getElementById("scheduleDesignation").value,
-            time: document.getElementById("scheduleTime").value
+            time: document.getElementById("scheduleTime").value,
+            large_room: document.getElementById("scheduleLargeRoom").checked
         };
 
         fetch("/schedule_meeting/", {
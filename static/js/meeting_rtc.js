@@ -7,7 +7,11 @@
   const getName = () => localStorage.getItem("connectly.name") || "Anon";
   const isHost = (localStorage.getItem("connectly.is_host") === "1");
   const prevClientId = sessionStorage.getItem(MKEY("clientId"));
-  const selfId = Math.random().toString(36).slice(2);
+  // signed by the server for this meeting; the socket is refused without it
+  const JOIN = JSON.parse(document.getElementById("join-token").textContent);
+  const selfId = JOIN.clientId;
+  // large rooms: attendees only watch, so they call every speaker themselves
+  const isAttendee = JOIN.role === "attendee";
   sessionStorage.setItem(MKEY("clientId"), selfId);
 
 const ICE_SERVERS = [
@@ -30,6 +34,17 @@ const ICE_SERVERS = [
 ];
 
   let WS = null;
+  // roster version from the server; sent back on reconnect to get a delta
+  let rosterVersion = null;
+  const roster = new Map();
+  let closing = false;
+  let backfilled = false;
+  let audienceCursor = null;
+  // frames handled on the current socket; acked so the server can hold
+  // back a client that falls behind (ACK_EVERY must stay below its window)
+  const ACK_EVERY = 16;
+  let received = 0;
+  let reconnectDelay = 1000;
 
   const peers = new Map();
   let localStream = null;
@@ -56,6 +71,7 @@ const ICE_SERVERS = [
   });
 
   window.addEventListener("beforeunload", () => {
+    closing = true;
     try { WS?.send(JSON.stringify({ type: "leave" })); } catch(e){}
     WS?.close();
   });
@@ -124,11 +140,50 @@ const ICE_SERVERS = [
     });
   }
 
-  function connectWS(){
+  // the token in the page expires after MEETING_JOIN_TOKEN_MAX_AGE, and the
+  // camera prompt or a long outage can outlast it: get a fresh one, for the
+  // same clientId, before every (re)connect. false: no longer admitted
+  async function refreshToken() {
+    const res = await fetch(
+      `/meet_code/${meetingCode}/token/?token=${encodeURIComponent(JOIN.token)}`,
+      { credentials: "same-origin", cache: "no-store" }
+    );
+    if (res.status === 403 || res.status === 404) return false;
+    if (!res.ok) throw new Error(`token refresh failed: ${res.status}`);
+    const data = await res.json();
+    JOIN.token = data.token;
+    return true;
+  }
+
+  function meetingGone() {
+    closing = true;
+    BR.toast("This meeting is no longer available");
+    setTimeout(() => location.href = "/", 1200);
+  }
+
+  function scheduleReconnect() {
+    setTimeout(connectWS, reconnectDelay);
+    reconnectDelay = Math.min(reconnectDelay * 2, 10000);
+  }
+
+  async function connectWS(){
+    if (closing) return;
+    try {
+      if (!(await refreshToken())) {
+        meetingGone();
+        return;
+      }
+    } catch (e) {
+      // offline or server restarting: try again later
+      scheduleReconnect();
+      return;
+    }
     const proto = location.protocol === "https:" ? "wss" : "ws";
-    WS = new WebSocket(`${proto}://${location.host}/ws/meet/${meetingCode}/`);
+    WS = new WebSocket(`${proto}://${location.host}/ws/meet/${meetingCode}/?token=${encodeURIComponent(JOIN.token)}`);
+    received = 0;
 
     WS.onopen = () => {
+      reconnectDelay = 1000;
       if (prevClientId && prevClientId !== selfId) {
         try { WS.send(JSON.stringify({ type: "leave" })); } catch(e){}
       }
@@ -136,36 +191,91 @@ const ICE_SERVERS = [
         type: "presence",
         clientId: selfId,
         name: getName(),
-        is_host: isHost
+        is_host: isHost,
+        since: rosterVersion
       }));
     };
 
+    // network drop: come back with the same clientId; within the server's
+    // grace period the room sees no leave/join. 4401 (token refused) and
+    // 4404 (meeting ended or gone) will not get better by retrying
+    WS.onclose = (ev) => {
+      if (closing) return;
+      if (ev.code === 4401 || ev.code === 4404) {
+        meetingGone();
+        return;
+      }
+      scheduleReconnect();
+    };
+
     WS.onmessage = async (ev) => {
+      if (++received % ACK_EVERY === 0) safeSend({ type: "ack", received });
       const msg = JSON.parse(ev.data);
       const t = msg.type;
 
       if (t === "participant_list") {
         const list = Array.isArray(msg.participants) ? msg.participants : [];
-        list.forEach(({clientId, name}) => {
-          if (!clientId || clientId === selfId) return;
-          BR.upsertParticipant({ id: clientId, name: name || "Peer" });
-          if (selfId < clientId) startCall(clientId);
+        const ids = new Set(list.map(p => p.clientId));
+        [...roster.keys()].forEach(id => { if (!ids.has(id)) applyLeave(id); });
+        list.forEach(({clientId, name}) => applyJoin(clientId, name));
+        rosterVersion = msg.version ?? null;
+        return;
+      }
+
+      if (t === "roster_delta") {
+        (msg.changes || []).forEach(c => {
+          if (c.op === "join") applyJoin(c.clientId, c.name);
+          else applyLeave(c.clientId);
+        });
+        rosterVersion = msg.version;
+        return;
+      }
+
+      // large rooms: head count instead of a presence event per attendee
+      if (t === "roster_count") {
+        document.getElementById("offcanvas-participants-label").textContent =
+          `Participants (${msg.speakers + msg.attendees})`;
+        document.getElementById("audience").classList.remove("d-none");
+        document.getElementById("audience-label").textContent = `Attendees (${msg.attendees})`;
+        return;
+      }
+
+      if (t === "roster_page") {
+        const list = document.getElementById("audience-list");
+        (msg.participants || []).forEach(p => {
+          const li = document.createElement("li");
+          li.className = "list-group-item bg-transparent text-light";
+          li.textContent = p.name || "Peer";
+          list.appendChild(li);
         });
+        audienceCursor = msg.cursor ?? null;
+        document.getElementById("audience-more").classList.toggle("d-none", audienceCursor === null);
+        return;
+      }
+
+      if (t === "token") {
+        JOIN.token = msg.token;
         return;
       }
 
       if (t === "presence") {
-        const otherId = msg.clientId;
-        const otherName = msg.name || "Peer";
-        if (!otherId || otherId === selfId) return;
-        BR.upsertParticipant({ id: otherId, name: otherName });
-        if (selfId < otherId) await startCall(otherId);
+        if (inSequence(msg.version)) applyJoin(msg.clientId, msg.name);
         return;
       }
 
       if (t === "leave") {
-        const otherId = msg.clientId;
-        if (otherId) BR.removeParticipant(otherId);
+        if (inSequence(msg.version)) applyLeave(msg.clientId);
+        return;
+      }
+
+      // recent chat / hands, sent once when the socket opens
+      if (t === "backfill") {
+        if (backfilled) return;
+        backfilled = true;
+        (msg.messages || []).forEach(m => {
+          if (m.type === "chat") BR.addChat(m.name || "Anon", m.text || "");
+          else if (m.type === "hand") BR.systemChat(`${m.name || "Someone"} raised hand`);
+        });
         return;
       }
 
@@ -211,6 +321,7 @@ const ICE_SERVERS = [
       }
 
       if (t === "end_meeting") {
+        closing = true;
         BR.toast("Meeting ended by host");
         setTimeout(() => location.href = "/", 1200);
         return;
@@ -253,9 +364,57 @@ const ICE_SERVERS = [
         try { await peer.pc.addIceCandidate(msg.candidate); } catch(e) {}
         return;
       }
+
+      // server coalesces candidates sent close together into one frame
+      if (t === "candidate_batch") {
+        if (msg.to !== selfId) return;
+        const peer = ensurePeer(msg.from);
+        for (const candidate of msg.candidates || []) {
+          try { await peer.pc.addIceCandidate(candidate); } catch(e) {}
+        }
+        return;
+      }
     };
   }
 
+  // true if this roster change is the next one; on a gap ask for a delta
+  function inSequence(version) {
+    if (typeof version !== "number" || rosterVersion === null) return true;
+    if (version <= rosterVersion) return false;
+    if (version > rosterVersion + 1) {
+      safeSend({ type: "roster", since: rosterVersion });
+      return false;
+    }
+    rosterVersion = version;
+    return true;
+  }
+
+  function applyJoin(clientId, name) {
+    if (!clientId || clientId === selfId) return;
+    roster.set(clientId, name || "Peer");
+    BR.upsertParticipant({ id: clientId, name: name || "Peer" });
+    if ((isAttendee || selfId < clientId) && !peers.has(clientId)) startCall(clientId);
+  }
+
+  // attendee list, a page at a time and only while the panel is open
+  function requestAudiencePage(cursor) {
+    if (cursor === 0) document.getElementById("audience-list").replaceChildren();
+    safeSend({ type: "roster_page", audience: true, cursor });
+  }
+
+  document.getElementById("offcanvas-participants").addEventListener("shown.bs.offcanvas", () => {
+    if (!document.getElementById("audience").classList.contains("d-none")) requestAudiencePage(0);
+  });
+  document.getElementById("audience-more").addEventListener("click", () => {
+    if (audienceCursor !== null) requestAudiencePage(audienceCursor);
+  });
+
+  function applyLeave(clientId) {
+    if (!clientId) return;
+    roster.delete(clientId);
+    BR.removeParticipant(clientId);
+  }
+
   function ensurePeer(peerId) {
     if (peers.has(peerId)) return peers.get(peerId);
 
@@ -496,6 +655,7 @@ function stopShare() {
     if (!leaveBtn || leaveBtn.dataset._rtc) return;
     leaveBtn.dataset._rtc = "1";
     leaveBtn.addEventListener("click", () => {
+      closing = true;
       try { WS?.send(JSON.stringify({ type:"leave" })); } catch(e){}
       try {
         sessionStorage.removeItem(MKEY("clientId"));